@@ -2,11 +2,14 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
+from core.json_provider import OrjsonProvider
+from core.timestamps import utc_now_iso
 import logging
-from datetime import datetime
+import os
 
 # Initialize app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 app.config.from_object(Config)
 
@@ -39,16 +42,23 @@ app.register_blueprint(energy_bp, url_prefix="/api/energy")
 app.register_blueprint(scenario_bp, url_prefix="/api/scenario")
 app.register_blueprint(alert_bp, url_prefix="/api/alerts")
 
-# Initialize background services
-from services.background_service import start_background_tasks
-start_background_tasks()
+# Load trained ML models, if any have been saved
+from services.ml_service import ml_service
+ml_service.load_models()
+
 @app.route("/")
 def home():
     return {"message": "Backend is running!"}
 
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {"status": "healthy", "timestamp": utc_now_iso()}
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    # Local development only - production runs under gunicorn (see gunicorn.conf.py)
+    from services.background_service import start_background_tasks, stop_background_tasks
+    start_background_tasks()
+    try:
+        app.run(debug=os.getenv("FLASK_ENV") == "development", threaded=True, port=5000, host='0.0.0.0')
+    finally:
+        stop_background_tasks()
\ No newline at end of file
@@ -26,20 +26,66 @@ def make_celery(app):
 
 # Celery tasks
 from celery import Celery
+from celery.signals import worker_init
+from kombu import Queue
+from datetime import datetime, timedelta
 import logging
+import sys
+
+# Import services up front so the prefork parent loads them (and the ML models)
+# once and workers share those pages copy-on-write, instead of paying the
+# import on each worker's first task
+from services.firebase_service import get_sensor_data, add_document
+from services.optimization_service import energy_optimizer
+from services.ml_service import ml_service
+from services.database_service import get_energy_history_bulk, get_daily_zone_summary
+from services.notification_service import notification_service
+from core.logger import log_action
+
+ml_service.load_models()
 
 celery = Celery('microgrid')
 celery.config_from_object(Config)
 
+# Short optimization runs and long retraining/report jobs go to separate
+# queues, and workers only reserve one task at a time so a slow job never
+# holds quick ones hostage. The fast tasks are I/O-bound, so they run on
+# green threads; retraining is CPU-bound and keeps the prefork pool:
+#   celery -A celery_app.celery worker -P eventlet -c 50 -Q fast
+#   celery -A celery_app.celery worker -P prefork -c 2 -Ofair -Q slow
+celery.conf.update(
+    # Celery only reads CELERY_BROKER_URL under a Django-style namespace
+    broker_url=Config.CELERY_BROKER_URL,
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_default_queue='fast',
+    task_queues=(
+        # Optimization results are reproducible, so the fast queue needn't survive a broker restart
+        Queue('fast', routing_key='fast', durable=False),
+        Queue('slow', routing_key='slow'),
+    ),
+    task_routes={
+        'celery_app.retrain_models_task': {'queue': 'slow'},
+        'celery_app.send_daily_report_task': {'queue': 'slow'},
+    },
+)
+
 logger = logging.getLogger(__name__)
 
+@worker_init.connect
+def patch_green_drivers(**kwargs):
+    """Make psycopg2 cooperate with green threads when running the eventlet pool"""
+    # The celery CLI has already monkey-patched the stdlib by this point;
+    # psycopg2 is a C extension and needs its own wait callback
+    if 'eventlet' in sys.modules:
+        from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+        logger.info("psycopg2 patched for eventlet")
+
 @celery.task
 def optimize_energy_task():
     """Background task for energy optimization"""
     try:
-        from services.firebase_service import get_sensor_data
-        from services.optimization_service import energy_optimizer
-        
         sensor_data = get_sensor_data()
         if sensor_data:
             result = energy_optimizer.optimize_energy_allocation(sensor_data)
@@ -57,14 +103,10 @@ def optimize_energy_task():
 def retrain_models_task():
     """Background task for model retraining"""
     try:
-        from services.ml_service import ml_service
-        from services.database_service import get_energy_history
-        from config import Config
-        
-        # Collect historical data from all zones
+        # Collect historical data from all zones in one query
         historical_data = []
-        for zone in Config.ZONES.keys():
-            zone_history = get_energy_history(zone, hours=168)  # 7 days
+        history_by_zone = get_energy_history_bulk(Config.ZONES.keys(), hours=168)  # 7 days
+        for zone, zone_history in history_by_zone.items():
             for record in zone_history:
                 record["zone"] = zone
                 historical_data.append(record)
@@ -85,24 +127,9 @@ def retrain_models_task():
 def send_daily_report_task():
     """Send daily energy report"""
     try:
-        from services.notification_service import notification_service
-        from services.database_service import get_energy_history
-        from datetime import datetime, timedelta
-        
         # Generate daily report
         yesterday = datetime.utcnow() - timedelta(days=1)
-        report_data = {}
-        
-        for zone in Config.ZONES.keys():
-            history = get_energy_history(zone, hours=24)
-            if history:
-                total_consumption = sum(h["outputPower"] for h in history if h["outputPower"])
-                avg_battery = sum(h["batteryPercentage"] for h in history if h["batteryPercentage"]) / len(history)
-                
-                report_data[zone] = {
-                    "total_consumption": total_consumption,
-                    "avg_battery": avg_battery
-                }
+        report_data = get_daily_zone_summary(hours=24)
         
         # Send report
         report_message = f"Daily Energy Report - {yesterday.strftime('%Y-%m-%d')}\n"
@@ -110,15 +137,57 @@ def send_daily_report_task():
             report_message += f"{zone}: {data['total_consumption']:.1f}W consumed, {data['avg_battery']:.1f}% avg battery\n"
         
         if Config.ADMIN_EMAIL:
-            notification_service.send_email(
+            # SMTP can be slow and is retried on its own, so don't hold this worker for it
+            send_email_task.delay(
                 Config.ADMIN_EMAIL,
                 "Daily Energy Report",
                 report_message
             )
         
-        logger.info("Daily report sent successfully")
+        logger.info("Daily report queued successfully")
         return {"success": True}
         
     except Exception as e:
         logger.error(f"Daily report task error: {e}")
-        return {"success": False, "error": str(e)}
\ No newline at end of file
+        return {"success": False, "error": str(e)}
+
+@celery.task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=60)
+def send_email_task(self, to, subject, message, priority="NORMAL"):
+    """Send an email, retrying later if the SMTP send fails"""
+    if notification_service.send_email(to, subject, message, priority):
+        return {"success": True}
+    
+    if self.request.retries < self.max_retries:
+        raise self.retry()
+    
+    logger.error(f"Giving up on email to {to} after {self.max_retries} retries")
+    return {"success": False, "error": "Email delivery failed"}
+
+@celery.task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=10)
+def send_firebase_notification_task(self, user_id, title, body, data=None):
+    """Send a Firebase push notification, retrying later on failure"""
+    if notification_service.send_firebase_notification(user_id, title, body, data):
+        return {"success": True}
+    
+    if self.request.retries < self.max_retries:
+        raise self.retry()
+    
+    logger.error(f"Giving up on notification to {user_id} after {self.max_retries} retries")
+    return {"success": False, "error": "Notification delivery failed"}
+
+@celery.task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=10)
+def store_alert_task(self, alert):
+    """Store an alert in Firebase, retrying later on failure"""
+    if add_document("alerts", alert):
+        return {"success": True}
+    
+    if self.request.retries < self.max_retries:
+        raise self.retry()
+    
+    logger.error(f"Giving up on storing {alert.get('alert_type')} alert after {self.max_retries} retries")
+    return {"success": False, "error": "Alert storage failed"}
+
+@celery.task(ignore_result=True)
+def log_action_task(user_id, action, zone=None, extra_data=None):
+    """Write an audit log entry off the request path"""
+    log_action(user_id, action, zone, extra_data)
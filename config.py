@@ -9,11 +9,19 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+def _group_zones_by_type(zones):
+    """Invert the zone table into zone type -> tuple of zone names"""
+    zones_by_type = {}
+    for zone, zone_config in zones.items():
+        zones_by_type.setdefault(zone_config["type"], []).append(zone)
+    return {zone_type: tuple(names) for zone_type, names in zones_by_type.items()}
+
 class Config:
     # Security
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-secret-key")
     JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 3600))  # seconds
     
     # Firebase
     FIREBASE_DB_URL = os.getenv("FIREBASE_DB_URL", "")
@@ -21,7 +29,24 @@ class Config:
     
     # Database
     POSTGRES_URL = os.getenv("POSTGRES_URL", "postgresql://localhost:5432/microgrid")
+    DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 2))
+    DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 20))
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    REDIS_POOL_MAX = int(os.getenv("REDIS_POOL_MAX", 32))
+    # User rows are cached in Redis and then per process. Changes made by the app are
+    # invalidated at once; one made outside it (e.g. deactivating a user in SQL) takes
+    # effect within USER_CACHE_TTL + USER_LOCAL_CACHE_TTL seconds
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 20))  # seconds
+    USER_LOCAL_CACHE_TTL = int(os.getenv("USER_LOCAL_CACHE_TTL", 10))  # seconds
+    SENSOR_CACHE_TTL = 2  # seconds
+    # With no listener event for this long the pushed copy is distrusted and sensors are polled
+    SENSOR_STREAM_MAX_AGE = int(os.getenv("SENSOR_STREAM_MAX_AGE", 60))  # seconds
+    
+    # Batched database writers: rows are flushed when the batch fills or the interval passes
+    AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", 100))  # rows
+    AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 0.2))  # seconds
+    ENERGY_BUFFER_SIZE = int(os.getenv("ENERGY_BUFFER_SIZE", 100))  # rows
+    ENERGY_FLUSH_INTERVAL = float(os.getenv("ENERGY_FLUSH_INTERVAL", 0.2))  # seconds
     
     # Twilio
     TWILIO_SID = os.getenv("TWILIO_SID", "")
@@ -32,6 +57,14 @@ class Config:
     ADMIN_PHONE = os.getenv("ADMIN_PHONE", "")
     ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "")
     
+    # Outgoing email
+    SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+    EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "")
+    
+    # Only the process with RUN_BG_SERVICES=1 runs the background monitors and watchdog
+    RUN_BG_SERVICES = os.getenv("RUN_BG_SERVICES") == "1"
+    
     # Celery
     CELERY_BROKER_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     CELERY_RESULT_BACKEND = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -44,6 +77,11 @@ class Config:
         "Zone4": {"type": "deferrable", "priority": 4, "name": "Water Pumps"}
     }
     
+    # Precomputed lookup sets for request validation
+    ZONE_NAMES = frozenset(ZONES)
+    VALID_ACTIONS = frozenset({"ON", "OFF"})
+    ZONES_BY_TYPE = _group_zones_by_type(ZONES)
+    
     # Battery thresholds
     CRITICAL_BATTERY_THRESHOLD = 10  # %
     LOW_BATTERY_THRESHOLD = 20  # %
@@ -3,11 +3,16 @@ Enhanced Admin Controller with comprehensive zone control and system management
 """
 
 from flask import request, jsonify
-from services.firebase_service import set_command, get_sensor_data
+from services.firebase_service import set_command, get_request_sensor_data, get_sensor_data_async
 from services.optimization_service import energy_optimizer
+from services.ml_service import ml_service
 from services.notification_service import notification_service
-from core.logger import log_action
+from controllers.energy_controller import aggregate_sensor_data
+from core.logger import log_action_async
+from core.pagination import safe_limit
+from celery_app import send_firebase_notification_task
 from config import Config
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,35 +24,40 @@ def control_zone(user, zone, action):
         if not zone or not action:
             return jsonify({"message": "Zone and action required"}), 400
             
-        if zone not in Config.ZONES:
+        if zone not in Config.ZONE_NAMES:
             return jsonify({"message": "Invalid zone"}), 400
             
-        if action not in ["ON", "OFF"]:
+        if action not in Config.VALID_ACTIONS:
             return jsonify({"message": "Action must be ON or OFF"}), 400
         
         # Check if this is a critical zone being turned OFF
         zone_config = Config.ZONES[zone]
         if zone_config["type"] == "critical" and action == "OFF":
             # Get current battery level
-            sensor_data = get_sensor_data()
+            sensor_data = get_request_sensor_data()
             zone_data = sensor_data.get(zone, {})
             battery_level = zone_data.get("batteryPercentage", 0)
             
             if battery_level > Config.CRITICAL_BATTERY_THRESHOLD:
                 logger.warning(f"Admin turning OFF critical zone {zone} with sufficient battery")
                 # Send alert but allow the action
-                notification_service.send_firebase_notification(
+                notification_args = (
                     user["id"],
                     "Critical Zone Override",
                     f"You turned OFF critical zone {zone} with {battery_level:.1f}% battery",
                     {"type": "critical_override", "zone": zone}
                 )
+                try:
+                    send_firebase_notification_task.delay(*notification_args)
+                except Exception as e:
+                    logger.warning(f"Could not queue override notification, sending inline: {e}")
+                    notification_service.send_firebase_notification(*notification_args)
         
         # Execute command
         success = set_command(zone, action)
         
         if success:
-            log_action(
+            log_action_async(
                 user["id"], 
                 f"Admin override: Set {zone} to {action}",
                 zone,
@@ -67,32 +77,32 @@ def control_zone(user, zone, action):
         logger.error(f"Zone control error: {e}")
         return jsonify({"message": "Internal server error"}), 500
 
-def get_system_overview(user):
+async def get_system_overview(user):
     """Get comprehensive system overview for admin"""
     try:
-        sensor_data = get_sensor_data()
+        # Sensor read and schedule forecast don't depend on each other
+        sensor_data, schedule = await asyncio.gather(
+            get_sensor_data_async(),
+            asyncio.to_thread(energy_optimizer.get_optimization_schedule, 24)
+        )
         
         # Calculate system metrics
         total_zones = len(Config.ZONES)
-        active_zones = sum(1 for zone_data in sensor_data.values() 
-                          if zone_data.get("relayState", False))
-        
-        total_input = sum(zone.get("inputPower", 0) for zone in sensor_data.values())
-        total_output = sum(zone.get("outputPower", 0) for zone in sensor_data.values())
-        avg_battery = sum(zone.get("batteryPercentage", 50) for zone in sensor_data.values()) / len(sensor_data) if sensor_data else 0
-        
-        # Get optimization schedule
-        schedule = energy_optimizer.get_optimization_schedule(24)
+        total_input, total_output, _, avg_battery, active_zones = aggregate_sensor_data(sensor_data)
         
-        # Zone status with priorities
+        # Zone status with priorities; sustain hours for all zones in one model call
+        zone_data_list = [sensor_data.get(zone, {}) for zone in Config.ZONES]
+        sustain_hours = ml_service.predict_battery_sustain_batch(zone_data_list)
+        efficiencies = energy_optimizer._calculate_efficiency_batch(zone_data_list)
         zone_status = {}
-        for zone, config in Config.ZONES.items():
-            zone_data = sensor_data.get(zone, {})
+        for (zone, config), zone_data, zone_sustain_hours, efficiency in zip(
+            Config.ZONES.items(), zone_data_list, sustain_hours, efficiencies
+        ):
             zone_status[zone] = {
                 **config,
                 "current_data": zone_data,
-                "efficiency": energy_optimizer._calculate_efficiency(zone_data),
-                "sustain_hours": ml_service.predict_battery_sustain(zone_data)
+                "efficiency": efficiency,
+                "sustain_hours": zone_sustain_hours
             }
         
         return jsonify({
@@ -116,13 +126,13 @@ def get_system_overview(user):
 def force_optimization(user):
     """Force immediate optimization run"""
     try:
-        sensor_data = get_sensor_data()
+        sensor_data = get_request_sensor_data()
         if not sensor_data:
             return jsonify({"message": "No sensor data available"}), 404
         
         result = energy_optimizer.optimize_energy_allocation(sensor_data)
         
-        log_action(
+        log_action_async(
             user["id"],
             "Forced optimization run",
             extra_data={"result": result}
@@ -140,31 +150,12 @@ def force_optimization(user):
 def get_audit_logs(user):
     """Get audit logs for admin review"""
     try:
-        from services.database_service import get_db_connection
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"message": "Database connection failed"}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT timestamp, user_id, action, zone, extra_data
-            FROM audit_logs
-            ORDER BY timestamp DESC
-            LIMIT 100
-        """)
-        
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        logs = [{
-            "timestamp": row[0].isoformat(),
-            "user_id": row[1],
-            "action": row[2],
-            "zone": row[3],
-            "extra_data": row[4]
-        } for row in rows]
+        from services.database_service import get_recent_audit_logs
+        
+        limit = safe_limit(request.args.get("limit"), default=100, cap=1000)
+        logs = get_recent_audit_logs(limit)
+        if logs is None:
+            return jsonify({"message": "Failed to get audit logs"}), 500
         
         return jsonify({"logs": logs})
         
@@ -185,7 +176,7 @@ def send_message_to_household(user):
         success = notification_service.send_admin_message_to_household(household_id, message)
         
         if success:
-            log_action(
+            log_action_async(
                 user["id"],
                 f"Sent message to household {household_id}",
                 extra_data={"message": message}
@@ -4,14 +4,36 @@ Enhanced Authentication Controller with secure login and user management
 
 from flask import request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import check_password_hash
 from services.database_service import get_user_by_email, get_user_by_id
-from core.auth import generate_tokens
-from core.logger import log_action
+from core.auth import generate_tokens, verify_password, password_needs_rehash, hash_password
+from core.logger import log_action_async
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Cap audit entries for failed logins per IP so a brute-force run can't flood the log queue
+FAILED_LOGIN_LOG_LIMIT = 10  # entries per IP per window
+FAILED_LOGIN_WINDOW = 60  # seconds
+_failed_login_window_start = 0
+_failed_login_counts = {}
+_failed_login_lock = threading.Lock()
+
+def _should_log_failed_login(ip):
+    """Rate-limit audit logging of failed login attempts per client IP"""
+    global _failed_login_window_start
+    
+    now = time.time()
+    with _failed_login_lock:
+        if now - _failed_login_window_start > FAILED_LOGIN_WINDOW:
+            _failed_login_window_start = now
+            _failed_login_counts.clear()
+        
+        count = _failed_login_counts.get(ip, 0) + 1
+        _failed_login_counts[ip] = count
+    return count <= FAILED_LOGIN_LOG_LIMIT
+
 def login():
     """Enhanced login API with proper security"""
     try:
@@ -25,36 +47,46 @@ def login():
         if not email or not password:
             return jsonify({"message": "Email and password required"}), 400
         
+        if not isinstance(password, str):
+            return jsonify({"message": "Password must be a string"}), 400
+        
         # Get user from database
         user = get_user_by_email(email)
         if not user:
-            log_action("unknown", f"Failed login attempt for {email}", extra_data={"ip": request.remote_addr})
+            if _should_log_failed_login(request.remote_addr):
+                log_action_async("unknown", f"Failed login attempt for {email}", extra_data={"ip": request.remote_addr})
             return jsonify({"message": "Invalid credentials"}), 401
         
         # Verify password
-        if not check_password_hash(user["password_hash"], password):
-            log_action(user["id"], f"Failed login attempt", extra_data={"ip": request.remote_addr})
+        if not verify_password(user["password_hash"], password):
+            if _should_log_failed_login(request.remote_addr):
+                log_action_async(user["id"], f"Failed login attempt", extra_data={"ip": request.remote_addr})
             return jsonify({"message": "Invalid credentials"}), 401
         
         # Generate tokens
         tokens = generate_tokens(user)
         
-        # Update last login
-        from services.database_service import get_db_connection
-        conn = get_db_connection()
-        if conn:
-            try:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s
-                """, (user["id"],))
-                conn.commit()
-                cursor.close()
-                conn.close()
-            except Exception as e:
-                logger.error(f"Error updating last login: {e}")
-        
-        log_action(user["id"], "Successful login", extra_data={"ip": request.remote_addr})
+        # Update last login, upgrading legacy password hashes while we have the plaintext
+        from services.database_service import db_conn
+        from core.decorators import invalidate_user
+        rehash = password_needs_rehash(user["password_hash"])
+        try:
+            with db_conn() as conn, conn.cursor() as cursor:
+                if rehash:
+                    cursor.execute("""
+                        UPDATE users SET last_login = CURRENT_TIMESTAMP, password_hash = %s WHERE id = %s
+                    """, (hash_password(password), user["id"]))
+                else:
+                    cursor.execute("""
+                        UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s
+                    """, (user["id"],))
+            if rehash:
+                # Committed; drop the cached row that still holds the old hash
+                invalidate_user(user)
+        except Exception as e:
+            logger.error(f"Error updating last login: {e}")
+        
+        log_action_async(user["id"], "Successful login", extra_data={"ip": request.remote_addr})
         
         return jsonify({
             "message": "Login successful",
@@ -83,7 +115,7 @@ def refresh_token():
         
         tokens = generate_tokens(user)
         
-        log_action(user["id"], "Token refreshed")
+        log_action_async(user["id"], "Token refreshed")
         
         return jsonify({
             "message": "Token refreshed",
@@ -99,7 +131,7 @@ def logout():
     """Logout user (client should discard tokens)"""
     try:
         current_user_id = get_jwt_identity()
-        log_action(current_user_id, "User logged out")
+        log_action_async(current_user_id, "User logged out")
         
         return jsonify({"message": "Logged out successfully"})
         
@@ -2,47 +2,47 @@
 Enhanced Energy Controller with comprehensive energy management
 """
 
-from flask import request, jsonify
-from services.firebase_service import get_sensor_data, get_zone_status
+from flask import request, jsonify, g, has_request_context
+from services.firebase_service import get_request_sensor_data, get_sensor_data_async, invalidate_sensor_data
 from services.ml_service import ml_service
-from services.database_service import get_energy_history, store_energy_data
+from services.database_service import (
+    get_energy_history, queue_energy_data,
+    cache_optimization_result, get_cached_optimization_result
+)
 from services.optimization_service import energy_optimizer
+from core.timestamps import utc_now_iso
+from core.validation import is_reading
 from config import Config
+import asyncio
+import hashlib
 import logging
+import orjson
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-def energy_status():
+async def energy_status():
     """Get comprehensive energy status"""
     try:
         # Get real-time data
-        sensor_data = get_sensor_data()
+        sensor_data = await get_sensor_data_async()
         if not sensor_data:
             return jsonify({"message": "No sensor data available"}), 404
         
         # Calculate system-wide metrics
         system_metrics = calculate_system_metrics(sensor_data)
         
-        # Get predictions and anomalies for each zone
-        zone_analysis = {}
-        for zone, data in sensor_data.items():
-            sustain_hours = ml_service.predict_battery_sustain(data)
-            anomaly_result = ml_service.detect_anomaly(data)
-            
-            zone_analysis[zone] = {
-                "current_data": data,
-                "sustain_hours": sustain_hours,
-                "anomaly": anomaly_result,
-                "zone_config": Config.ZONES.get(zone, {}),
-                "efficiency": energy_optimizer._calculate_efficiency(data)
-            }
+        # Zone analysis and the optimizer run are independent, so overlap them
+        zone_analysis, recommendations = await asyncio.gather(
+            asyncio.to_thread(analyze_zones, sensor_data),
+            asyncio.to_thread(get_optimization_recommendations, sensor_data)
+        )
         
         return jsonify({
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_now_iso(),
             "system_metrics": system_metrics,
             "zones": zone_analysis,
-            "optimization_recommendations": get_optimization_recommendations(sensor_data)
+            "optimization_recommendations": recommendations
         })
         
     except Exception as e:
@@ -62,23 +62,18 @@ def update_voltage():
         if not zone or voltage is None:
             return jsonify({"message": "Zone and voltage required"}), 400
         
-        if zone not in Config.ZONES:
-            return jsonify({"message": "Invalid zone"}), 400
+        if not is_reading(voltage):
+            return jsonify({"message": "Voltage must be a number"}), 400
         
-        # Store the voltage update
-        energy_data = {
-            "batteryVoltage": voltage,
-            "timestamp": datetime.utcnow().isoformat(),
-            "source": "esp32_update"
-        }
+        if zone not in Config.ZONE_NAMES:
+            return jsonify({"message": "Invalid zone"}), 400
         
-        success = store_energy_data(zone, energy_data)
+        # Queue the voltage update; it is written with the next batched insert
+        queue_energy_data(zone, {"batteryVoltage": voltage})
+        invalidate_sensor_data()
         
-        if success:
-            logger.info(f"Voltage updated for {zone}: {voltage}V")
-            return jsonify({"message": "Voltage updated successfully"})
-        else:
-            return jsonify({"message": "Failed to store voltage data"}), 500
+        logger.info(f"Voltage update queued for {zone}: {voltage}V")
+        return jsonify({"message": "Voltage update accepted"}), 202
             
     except Exception as e:
         logger.error(f"Voltage update error: {e}")
@@ -93,7 +88,7 @@ def get_zone_history():
         if not zone:
             return jsonify({"message": "Zone parameter required"}), 400
             
-        if zone not in Config.ZONES:
+        if zone not in Config.ZONE_NAMES:
             return jsonify({"message": "Invalid zone"}), 400
         
         history = get_energy_history(zone, hours)
@@ -112,7 +107,7 @@ def get_zone_history():
 def run_optimization():
     """Manually trigger optimization"""
     try:
-        sensor_data = get_sensor_data()
+        sensor_data = get_request_sensor_data()
         if not sensor_data:
             return jsonify({"message": "No sensor data available"}), 404
         
@@ -127,43 +122,42 @@ def run_optimization():
         logger.error(f"Manual optimization error: {e}")
         return jsonify({"message": "Optimization failed"}), 500
 
-def get_predictions():
+async def get_predictions():
     """Get ML predictions for energy planning"""
     try:
-        sensor_data = get_sensor_data()
+        sensor_data = await get_sensor_data_async()
         if not sensor_data:
             return jsonify({"message": "No sensor data available"}), 404
         
-        predictions = {}
+        # Demand prediction for next few hours - solar and demand forecasts
+        # don't depend on the zone, so compute them once for all zones
+        now = datetime.now()
+        day_of_week = now.weekday()
+        future_hours = [(now.hour + hour_offset) % 24 for hour_offset in range(1, 7)]  # Next 6 hours
         
-        for zone, data in sensor_data.items():
-            # Battery sustain prediction
-            sustain_hours = ml_service.predict_battery_sustain(data)
-            
-            # Demand prediction for next few hours
-            current_hour = datetime.now().hour
-            demand_predictions = []
-            
-            for hour_offset in range(1, 7):  # Next 6 hours
-                future_hour = (current_hour + hour_offset) % 24
-                predicted_demand = ml_service.predict_demand(
-                    future_hour, 
-                    datetime.now().weekday(),
-                    energy_optimizer._predict_solar_generation(future_hour)
-                )
-                demand_predictions.append({
-                    "hour": future_hour,
-                    "predicted_demand": predicted_demand
-                })
-            
-            predictions[zone] = {
-                "sustain_hours": sustain_hours,
+        predicted_demands = ml_service.predict_demand_batch([
+            [hour, day_of_week, energy_optimizer._predict_solar_generation(hour)]
+            for hour in future_hours
+        ])
+        demand_predictions = [
+            {"hour": hour, "predicted_demand": demand}
+            for hour, demand in zip(future_hours, predicted_demands)
+        ]
+        
+        zone_data_list = list(sensor_data.values())
+        sustain_hours = await asyncio.to_thread(ml_service.predict_battery_sustain_batch, zone_data_list)
+        efficiencies = energy_optimizer._calculate_efficiency_batch(zone_data_list)
+        predictions = {
+            zone: {
+                "sustain_hours": zone_sustain_hours,
                 "demand_forecast": demand_predictions,
-                "current_efficiency": energy_optimizer._calculate_efficiency(data)
+                "current_efficiency": efficiency
             }
+            for zone, zone_sustain_hours, efficiency in zip(sensor_data.keys(), sustain_hours, efficiencies)
+        }
         
         return jsonify({
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_now_iso(),
             "predictions": predictions
         })
         
@@ -171,18 +165,46 @@ def get_predictions():
         logger.error(f"Predictions error: {e}")
         return jsonify({"message": "Failed to get predictions"}), 500
 
+def analyze_zones(sensor_data):
+    """Get predictions and anomalies for all zones, one model call each"""
+    zone_data_list = list(sensor_data.values())
+    sustain_hours = ml_service.predict_battery_sustain_batch(zone_data_list)
+    anomaly_results = ml_service.detect_anomaly_batch(zone_data_list)
+    efficiencies = energy_optimizer._calculate_efficiency_batch(zone_data_list)
+    
+    return {
+        zone: {
+            "current_data": data,
+            "sustain_hours": zone_sustain_hours,
+            "anomaly": anomaly_result,
+            "zone_config": Config.ZONES.get(zone, {}),
+            "efficiency": efficiency
+        }
+        for (zone, data), zone_sustain_hours, anomaly_result, efficiency
+        in zip(sensor_data.items(), sustain_hours, anomaly_results, efficiencies)
+    }
+
+def aggregate_sensor_data(sensor_data):
+    """Sum power readings, average battery and count active zones in one pass"""
+    total_input = total_output = total_solar = total_battery = 0
+    active_zones = 0
+    
+    for zone_data in sensor_data.values():
+        total_input += zone_data.get("inputPower", 0)
+        total_output += zone_data.get("outputPower", 0)
+        total_solar += zone_data.get("solarGeneration", 0)
+        total_battery += zone_data.get("batteryPercentage", 50)
+        active_zones += bool(zone_data.get("relayState", False))
+    
+    avg_battery = total_battery / len(sensor_data) if sensor_data else 0
+    return total_input, total_output, total_solar, avg_battery, active_zones
+
 def calculate_system_metrics(sensor_data):
     """Calculate comprehensive system metrics"""
     if not sensor_data:
         return {}
     
-    total_input = sum(zone.get("inputPower", 0) for zone in sensor_data.values())
-    total_output = sum(zone.get("outputPower", 0) for zone in sensor_data.values())
-    total_solar = sum(zone.get("solarGeneration", 0) for zone in sensor_data.values())
-    avg_battery = sum(zone.get("batteryPercentage", 50) for zone in sensor_data.values()) / len(sensor_data)
-    
-    active_zones = sum(1 for zone_data in sensor_data.values() 
-                      if zone_data.get("relayState", False))
+    total_input, total_output, total_solar, avg_battery, active_zones = aggregate_sensor_data(sensor_data)
     
     # Calculate efficiency
     system_efficiency = (total_output / total_input * 100) if total_input > 0 else 0
@@ -215,11 +237,30 @@ def get_energy_status(battery_level, net_energy):
     else:
         return "NORMAL"
 
+def simulate_optimization(sensor_data):
+    """
+    Run the optimizer without executing commands, reusing the result for the
+    same sensor snapshot within a request and across requests for a few seconds
+    """
+    snapshot_key = hashlib.blake2b(
+        orjson.dumps(sensor_data, option=orjson.OPT_SORT_KEYS), digest_size=8
+    ).hexdigest()
+    request_memo = g.setdefault("optimization_results", {}) if has_request_context() else {}
+    
+    result = request_memo.get(snapshot_key) or get_cached_optimization_result(snapshot_key)
+    if result is None:
+        result = energy_optimizer.optimize_energy_allocation(sensor_data, execute=False)
+        if result["success"]:
+            cache_optimization_result(snapshot_key, result)
+    
+    request_memo[snapshot_key] = result
+    return result
+
 def get_optimization_recommendations(sensor_data):
     """Get optimization recommendations without executing them"""
     try:
         # Run optimization in simulation mode
-        result = energy_optimizer.optimize_energy_allocation(sensor_data)
+        result = simulate_optimization(sensor_data)
         
         if result["success"]:
             return {
@@ -3,13 +3,14 @@ Enhanced Household Controller with detailed energy insights
 """
 
 from flask import request, jsonify
-from services.firebase_service import get_sensor_data, set_command
+from services.firebase_service import db, get_request_sensor_data, set_command
 from services.ml_service import ml_service
-from services.database_service import get_energy_history
-from core.logger import log_action
+from services.database_service import get_energy_history_summary
+from controllers.energy_controller import aggregate_sensor_data
+from core.timestamps import utc_now_iso
+from core.logger import log_action_async
 from config import Config
 import logging
-from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
@@ -21,28 +22,30 @@ def get_household_data(user):
             return jsonify({"message": "No household ID associated with user"}), 400
         
         # Get current sensor data
-        all_sensor_data = get_sensor_data()
+        all_sensor_data = get_request_sensor_data()
         
         # Filter data for this household (assuming zone mapping)
         # In a real system, you'd have a mapping between households and zones
         household_zones = get_household_zones(household_id)
         
-        household_data = {}
-        for zone in household_zones:
-            if zone in all_sensor_data:
-                zone_data = all_sensor_data[zone]
-                
-                # Add predictions and analysis
-                sustain_hours = ml_service.predict_battery_sustain(zone_data)
-                anomaly_result = ml_service.detect_anomaly(zone_data)
-                
-                household_data[zone] = {
-                    "current_data": zone_data,
-                    "zone_info": Config.ZONES.get(zone, {}),
-                    "sustain_hours": sustain_hours,
-                    "anomaly": anomaly_result,
-                    "status": get_zone_status_description(zone_data)
-                }
+        reporting_zones = [zone for zone in household_zones if zone in all_sensor_data]
+        zone_data_list = [all_sensor_data[zone] for zone in reporting_zones]
+        
+        # Add predictions and analysis for all zones in one model call each
+        sustain_hours = ml_service.predict_battery_sustain_batch(zone_data_list)
+        anomaly_results = ml_service.detect_anomaly_batch(zone_data_list)
+        
+        household_data = {
+            zone: {
+                "current_data": zone_data,
+                "zone_info": Config.ZONES.get(zone, {}),
+                "sustain_hours": zone_sustain_hours,
+                "anomaly": anomaly_result,
+                "status": get_zone_status_description(zone_data)
+            }
+            for zone, zone_data, zone_sustain_hours, anomaly_result
+            in zip(reporting_zones, zone_data_list, sustain_hours, anomaly_results)
+        }
         
         # Get recent history
         history_summary = get_household_history_summary(household_zones)
@@ -52,7 +55,7 @@ def get_household_data(user):
         
         return jsonify({
             "household_id": household_id,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": utc_now_iso(),
             "zones": household_data,
             "metrics": household_metrics,
             "history_summary": history_summary,
@@ -73,7 +76,7 @@ def limited_zone_control(user):
         if not zone or not action:
             return jsonify({"message": "Zone and action required"}), 400
         
-        if action not in ["ON", "OFF"]:
+        if action not in Config.VALID_ACTIONS:
             return jsonify({"message": "Action must be ON or OFF"}), 400
         
         # Check if household can control this zone
@@ -91,7 +94,7 @@ def limited_zone_control(user):
         # Check system constraints
         if action == "ON":
             # Check if turning ON this zone would cause issues
-            sensor_data = get_sensor_data()
+            sensor_data = get_request_sensor_data()
             zone_data = sensor_data.get(zone, {})
             battery_level = zone_data.get("batteryPercentage", 0)
             
@@ -105,7 +108,7 @@ def limited_zone_control(user):
         success = set_command(zone, action)
         
         if success:
-            log_action(
+            log_action_async(
                 user["id"],
                 f"Household control: Set {zone} to {action}",
                 zone,
@@ -129,25 +132,19 @@ def get_household_notifications(user):
     try:
         household_id = user.get("householdId")
         
-        from services.firebase_service import db
         ref = db.reference(f"notifications/household_{household_id}")
-        notifications = ref.get() or {}
+        # Let the database order by timestamp and return only the last 50
+        notifications = ref.order_by_child("timestamp").limit_to_last(50).get() or {}
         
-        # Convert to list and sort by timestamp
-        notification_list = []
-        for key, notification in notifications.items():
-            notification["id"] = key
-            notification_list.append(notification)
-        
-        # Sort by timestamp (newest first)
-        notification_list.sort(
-            key=lambda x: x.get("timestamp", ""), 
-            reverse=True
-        )
+        # Results arrive oldest first; reverse for newest first
+        notification_list = [
+            {**notification, "id": key}
+            for key, notification in reversed(list(notifications.items()))
+        ]
         
         return jsonify({
             "household_id": household_id,
-            "notifications": notification_list[:50]  # Last 50 notifications
+            "notifications": notification_list
         })
         
     except Exception as e:
@@ -165,7 +162,6 @@ def mark_notification_read(user):
         
         household_id = user.get("householdId")
         
-        from services.firebase_service import db
         ref = db.reference(f"notifications/household_{household_id}/{notification_id}")
         ref.update({"read": True})
         
@@ -175,41 +171,26 @@ def mark_notification_read(user):
         logger.error(f"Mark notification read error: {e}")
         return jsonify({"message": "Failed to mark notification as read"}), 500
 
+# This is a simplified mapping - in a real system, this would be in the database
+_HOUSEHOLD_ZONES = {
+    "H001": ("Zone2", "Zone3", "Zone4"),  # House 1 can control non-critical zones
+    "H002": ("Zone3", "Zone4"),
+    "H003": ("Zone4",)
+}
+
 def get_household_zones(household_id):
     """Get zones associated with a household"""
-    # This is a simplified mapping - in a real system, this would be in the database
-    household_zone_mapping = {
-        "H001": ["Zone2", "Zone3", "Zone4"],  # House 1 can control non-critical zones
-        "H002": ["Zone3", "Zone4"],
-        "H003": ["Zone4"]
-    }
-    
-    return household_zone_mapping.get(household_id, [])
+    return _HOUSEHOLD_ZONES.get(household_id, ())
 
 def calculate_household_metrics(household_data):
     """Calculate metrics specific to household"""
     if not household_data:
         return {}
     
-    total_consumption = sum(
-        zone["current_data"].get("outputPower", 0) 
-        for zone in household_data.values()
-    )
-    
-    total_generation = sum(
-        zone["current_data"].get("inputPower", 0) + zone["current_data"].get("solarGeneration", 0)
-        for zone in household_data.values()
-    )
-    
-    avg_battery = sum(
-        zone["current_data"].get("batteryPercentage", 50)
-        for zone in household_data.values()
-    ) / len(household_data)
-    
-    active_zones = sum(
-        1 for zone in household_data.values()
-        if zone["current_data"].get("relayState", False)
+    total_input, total_consumption, total_solar, avg_battery, active_zones = aggregate_sensor_data(
+        {zone: data["current_data"] for zone, data in household_data.items()}
     )
+    total_generation = total_input + total_solar
     
     return {
         "total_consumption": round(total_consumption, 2),
@@ -223,23 +204,21 @@ def calculate_household_metrics(household_data):
 
 def get_household_history_summary(zones, hours=24):
     """Get summarized history for household zones"""
+    if not zones:
+        return {}
+    
     try:
         summary = {}
         
-        for zone in zones:
-            history = get_energy_history(zone, hours)
-            if history:
-                # Calculate summary statistics
-                consumption_values = [h["outputPower"] for h in history if h["outputPower"]]
-                battery_values = [h["batteryPercentage"] for h in history if h["batteryPercentage"]]
-                
-                summary[zone] = {
-                    "data_points": len(history),
-                    "avg_consumption": round(sum(consumption_values) / len(consumption_values), 2) if consumption_values else 0,
-                    "max_consumption": round(max(consumption_values), 2) if consumption_values else 0,
-                    "min_battery": round(min(battery_values), 2) if battery_values else 0,
-                    "avg_battery": round(sum(battery_values) / len(battery_values), 2) if battery_values else 0
-                }
+        # Aggregates come back from one grouped query; just round them here
+        for zone, stats in get_energy_history_summary(zones, hours).items():
+            summary[zone] = {
+                "data_points": stats["data_points"],
+                "avg_consumption": round(stats["avg_consumption"] or 0, 2),
+                "max_consumption": round(stats["max_consumption"] or 0, 2),
+                "min_battery": round(stats["min_battery"] or 0, 2),
+                "avg_battery": round(stats["avg_battery"] or 0, 2)
+            }
         
         return summary
         
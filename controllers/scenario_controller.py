@@ -2,13 +2,21 @@
 Enhanced Scenario Controller with advanced optimization algorithms
 """
 
-from services.firebase_service import set_command
+from services.firebase_service import set_commands
 from services.optimization_service import energy_optimizer
 from config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _zones_of_type(*zone_types):
+    """Zones belonging to any of the given types, from the precomputed buckets"""
+    return [zone for zone_type in zone_types for zone in Config.ZONES_BY_TYPE.get(zone_type, ())]
+
+def _switch_zone_types(decisions, zone_types, command):
+    """Set the same command for every zone of the given types"""
+    decisions.update(dict.fromkeys(_zones_of_type(*zone_types), command))
+
 def apply_scenarios(sensor_data):
     """
     Apply enhanced optimization scenarios
@@ -36,39 +44,24 @@ def apply_emergency_scenario(sensor_data, emergency_type):
         decisions = {}
         
         if emergency_type == "BATTERY_CRITICAL":
-            # Only critical zones ON
-            for zone, config in Config.ZONES.items():
-                if config["type"] == "critical":
-                    decisions[zone] = "ON"
-                else:
-                    decisions[zone] = "OFF"
+            # Only critical zones ON - the optimizer's emergency decisions, built once at startup
+            decisions = energy_optimizer._emergency_mode(sensor_data)
                     
         elif emergency_type == "OVERLOAD":
             # Shed non-essential loads
-            for zone, config in Config.ZONES.items():
-                if config["type"] in ["critical", "semi-critical"]:
-                    decisions[zone] = "ON"
-                else:
-                    decisions[zone] = "OFF"
+            _switch_zone_types(decisions, ("critical", "semi-critical"), "ON")
+            _switch_zone_types(decisions, ("non-critical", "deferrable"), "OFF")
                     
         elif emergency_type == "GRID_FAILURE":
             # Optimize for maximum battery life
-            for zone, config in Config.ZONES.items():
-                zone_data = sensor_data.get(zone, {})
-                efficiency = energy_optimizer._calculate_efficiency(zone_data)
-                
-                if config["type"] == "critical":
-                    decisions[zone] = "ON"
-                elif config["type"] == "semi-critical" and efficiency > 0.8:
-                    decisions[zone] = "ON"
-                else:
-                    decisions[zone] = "OFF"
-        
-        # Execute emergency decisions
-        execution_results = {}
-        for zone, command in decisions.items():
-            success = set_command(zone, command)
-            execution_results[zone] = success
+            _switch_zone_types(decisions, ("critical",), "ON")
+            for zone in _zones_of_type("semi-critical"):
+                efficiency = energy_optimizer._calculate_efficiency(sensor_data.get(zone, {}))
+                decisions[zone] = "ON" if efficiency > 0.8 else "OFF"
+            _switch_zone_types(decisions, ("non-critical", "deferrable"), "OFF")
+        
+        # Execute emergency decisions in one batched write
+        execution_results = set_commands(decisions)
         
         logger.info(f"Emergency scenario applied: {emergency_type}")
         
@@ -92,53 +85,32 @@ def apply_time_based_scenario(sensor_data, time_of_day):
         
         # Morning scenario (6-10 AM)
         if 6 <= time_of_day <= 10:
-            for zone, config in Config.ZONES.items():
-                if config["type"] in ["critical", "semi-critical"]:
-                    decisions[zone] = "ON"
-                elif config["type"] == "deferrable":  # Water pumps, etc.
-                    decisions[zone] = "ON"  # Good time for water pumping
-                else:
-                    decisions[zone] = "OFF"
+            # Deferrable loads (water pumps, etc.) - good time for water pumping
+            _switch_zone_types(decisions, ("critical", "semi-critical", "deferrable"), "ON")
+            _switch_zone_types(decisions, ("non-critical",), "OFF")
         
         # Daytime scenario (10 AM - 6 PM)
         elif 10 <= time_of_day <= 18:
             # Solar generation peak - can run more loads
-            for zone, config in Config.ZONES.items():
-                zone_data = sensor_data.get(zone, {})
-                solar_gen = zone_data.get("solarGeneration", 0)
-                
-                if config["type"] == "critical":
-                    decisions[zone] = "ON"
-                elif solar_gen > 20:  # Good solar generation
-                    decisions[zone] = "ON"
-                else:
-                    decisions[zone] = "OFF"
+            _switch_zone_types(decisions, ("critical",), "ON")
+            for zone in _zones_of_type("semi-critical", "non-critical", "deferrable"):
+                solar_gen = sensor_data.get(zone, {}).get("solarGeneration", 0)
+                decisions[zone] = "ON" if solar_gen > 20 else "OFF"  # Good solar generation
         
         # Evening scenario (6 PM - 10 PM)
         elif 18 <= time_of_day <= 22:
-            for zone, config in Config.ZONES.items():
-                if config["type"] in ["critical", "semi-critical"]:
-                    decisions[zone] = "ON"  # Street lights, etc.
-                elif config["type"] == "non-critical":
-                    decisions[zone] = "ON"  # Entertainment time
-                else:
-                    decisions[zone] = "OFF"
+            # Street lights and entertainment time
+            _switch_zone_types(decisions, ("critical", "semi-critical", "non-critical"), "ON")
+            _switch_zone_types(decisions, ("deferrable",), "OFF")
         
         # Night scenario (10 PM - 6 AM)
         else:
-            for zone, config in Config.ZONES.items():
-                if config["type"] == "critical":
-                    decisions[zone] = "ON"
-                elif config["type"] == "semi-critical":
-                    decisions[zone] = "ON"  # Street lights for safety
-                else:
-                    decisions[zone] = "OFF"  # Save energy at night
-        
-        # Execute decisions
-        execution_results = {}
-        for zone, command in decisions.items():
-            success = set_command(zone, command)
-            execution_results[zone] = success
+            # Street lights stay on for safety; save energy elsewhere
+            _switch_zone_types(decisions, ("critical", "semi-critical"), "ON")
+            _switch_zone_types(decisions, ("non-critical", "deferrable"), "OFF")
+        
+        # Execute decisions in one batched write
+        execution_results = set_commands(decisions)
         
         logger.info(f"Time-based scenario applied for hour {time_of_day}")
         
@@ -163,33 +135,22 @@ def apply_weather_based_scenario(sensor_data, weather_forecast):
         
         # Cloudy/rainy weather - conserve energy
         if weather_forecast.get("condition") in ["cloudy", "rainy"]:
-            for zone, config in Config.ZONES.items():
-                zone_data = sensor_data.get(zone, {})
-                battery_level = zone_data.get("batteryPercentage", 50)
-                
-                if config["type"] == "critical":
-                    decisions[zone] = "ON"
-                elif config["type"] == "semi-critical" and battery_level > 30:
-                    decisions[zone] = "ON"
-                else:
-                    decisions[zone] = "OFF"
+            _switch_zone_types(decisions, ("critical",), "ON")
+            for zone in _zones_of_type("semi-critical"):
+                battery_level = sensor_data.get(zone, {}).get("batteryPercentage", 50)
+                decisions[zone] = "ON" if battery_level > 30 else "OFF"
+            _switch_zone_types(decisions, ("non-critical", "deferrable"), "OFF")
         
         # Sunny weather - can run more loads
         elif weather_forecast.get("condition") == "sunny":
-            for zone, config in Config.ZONES.items():
-                if config["type"] in ["critical", "semi-critical", "non-critical"]:
-                    decisions[zone] = "ON"
-                else:
-                    # Deferrable loads - check solar generation
-                    zone_data = sensor_data.get(zone, {})
-                    solar_gen = zone_data.get("solarGeneration", 0)
-                    decisions[zone] = "ON" if solar_gen > 30 else "OFF"
-        
-        # Execute decisions
-        execution_results = {}
-        for zone, command in decisions.items():
-            success = set_command(zone, command)
-            execution_results[zone] = success
+            _switch_zone_types(decisions, ("critical", "semi-critical", "non-critical"), "ON")
+            # Deferrable loads - check solar generation
+            for zone in _zones_of_type("deferrable"):
+                solar_gen = sensor_data.get(zone, {}).get("solarGeneration", 0)
+                decisions[zone] = "ON" if solar_gen > 30 else "OFF"
+        
+        # Execute decisions in one batched write
+        execution_results = set_commands(decisions)
         
         logger.info(f"Weather-based scenario applied: {weather_forecast.get('condition')}")
         
@@ -6,7 +6,12 @@ import jwt
 from datetime import datetime, timedelta
 from flask import current_app
 from flask_jwt_extended import create_access_token, create_refresh_token
-from werkzeug.security import check_password_hash, generate_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.security import check_password_hash
+
+# Argon2id with a fixed, tunable cost; older pbkdf2 hashes are still accepted
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
 
 def generate_tokens(user):
     """Generate access and refresh tokens for a user"""
@@ -30,11 +35,34 @@ def generate_tokens(user):
 
 def verify_password(stored_password, provided_password):
     """Verify password hash"""
-    return check_password_hash(stored_password, provided_password)
+    if not stored_password.startswith("$argon2"):
+        # Legacy Werkzeug pbkdf2 hash
+        return check_password_hash(stored_password, provided_password)
+    
+    try:
+        return _password_hasher.verify(stored_password, provided_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+_dummy_hash = None
+
+def reject_password(provided_password):
+    """Spend a real verification's worth of time, so unknown users can't be told apart by timing"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = _password_hasher.hash("not-a-real-password")
+    verify_password(_dummy_hash, provided_password)
+    return False
+
+def password_needs_rehash(stored_password):
+    """Check whether a stored hash should be upgraded to the current parameters"""
+    if not stored_password.startswith("$argon2"):
+        return True
+    return _password_hasher.check_needs_rehash(stored_password)
 
 def hash_password(password):
     """Hash password for storage"""
-    return generate_password_hash(password)
+    return _password_hasher.hash(password)
 
 def decode_token(token):
     """Decode JWT token and return payload if valid"""
@@ -47,4 +75,4 @@ def decode_token(token):
     except jwt.ExpiredSignatureError:
         return {"error": "Token expired"}
     except jwt.InvalidTokenError:
-        return {"error": "Invalid token"}
\ No newline at end of file
+        return {"error": "Invalid token"}
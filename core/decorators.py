@@ -3,50 +3,109 @@ Enhanced decorators for role-based access control and rate limiting
 """
 
 from functools import wraps
-from flask import request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from services.database_service import get_user_by_id
-from core.logger import log_action
-import time
+from flask import request, jsonify, current_app, g
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from services.database_service import get_user_by_id, get_redis_connection, invalidate_cached_user
+from core.logger import log_action_async
+from cachetools import TTLCache
+from config import Config
+import logging
+import redis
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Fixed-window counter: one round-trip to bump the count and start the window.
+# Registered on the shared Redis client rather than a pool of its own
+_RATE_LIMIT_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+_rate_limit_redis = get_redis_connection()
+_rate_limit_script = _rate_limit_redis.register_script(_RATE_LIMIT_LUA) if _rate_limit_redis else None
+
+# Short-lived cache of user rows so each authorized request doesn't hit the database
+_user_cache = TTLCache(maxsize=4096, ttl=Config.USER_LOCAL_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+
+def get_cached_user(user_id):
+    """Get user by ID, served from the in-process cache when fresh"""
+    with _user_cache_lock:
+        user = _user_cache.get(user_id)
+    if user is None:
+        user = get_user_by_id(user_id)
+        if user:
+            with _user_cache_lock:
+                _user_cache[user_id] = user
+    return user
+
+def invalidate_user(user):
+    """Drop a user's cached rows, in this process and in Redis, after their record changes"""
+    with _user_cache_lock:
+        _user_cache.pop(user["id"], None)
+    invalidate_cached_user(user)
+
+def _resolve_request_user():
+    """Verify the JWT and load its user once per request, caching both on g"""
+    if "user_role" not in g:
+        verify_jwt_in_request()
+        g.jwt_identity = get_jwt_identity()
+        g.user_role = get_jwt().get("role")
+    return g.jwt_identity, g.user_role
 
 def role_required(*allowed_roles):
     """
     Decorator to check if user has required role
     """
+    allowed = frozenset(allowed_roles)
+    
     def decorator(f):
         @wraps(f)
-        @jwt_required()
         def wrapper(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            claims = get_jwt()
-            user_role = claims.get("role")
+            current_user_id, user_role = _resolve_request_user()
             
-            if user_role not in allowed_roles:
-                log_action(current_user_id, f"Unauthorized access attempt to {request.endpoint}")
+            if user_role not in allowed:
+                log_action_async(current_user_id, f"Unauthorized access attempt to {request.endpoint}")
                 return jsonify({"message": "Access denied"}), 403
             
             # Get full user data
-            user = get_user_by_id(current_user_id)
-            if not user:
+            if "current_user" not in g:
+                g.current_user = get_cached_user(current_user_id)
+            if not g.current_user:
                 return jsonify({"message": "User not found"}), 404
+            
+            # The token's role claim lives until expiry; the user row reflects a role change
+            if g.current_user.get("role") not in allowed:
+                log_action_async(current_user_id, f"Unauthorized access attempt to {request.endpoint}")
+                return jsonify({"message": "Access denied"}), 403
                 
-            return f(user, *args, **kwargs)
+            return f(g.current_user, *args, **kwargs)
         return wrapper
     return decorator
 
 def rate_limit(max_requests=10, window=60):
     """
-    Simple rate limiting decorator
+    Rate limiting decorator backed by a Redis counter shared across workers
     """
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            # Simple in-memory rate limiting (use Redis in production)
-            client_ip = request.remote_addr
-            current_time = time.time()
+            key = f"rl:{request.endpoint}:{request.remote_addr}"
+            if _rate_limit_script is None:
+                return f(*args, **kwargs)
             
-            # This is a simplified implementation
-            # In production, use Redis with sliding window
+            try:
+                count = _rate_limit_script(keys=[key], args=[window])
+            except redis.RedisError as e:
+                # Fail open so a Redis outage doesn't take the API down
+                logger.warning(f"Rate limit check failed: {e}")
+                return f(*args, **kwargs)
+            
+            if count > max_requests:
+                return jsonify({"message": "Too many requests"}), 429
             
             return f(*args, **kwargs)
         return wrapper
@@ -58,17 +117,12 @@ def log_api_call(f):
     """
     @wraps(f)
     def wrapper(*args, **kwargs):
-        user_id = None
+        # Capture the request details up front; the handler can't change them
+        action = f"API call: {request.method} {request.endpoint}"
+        ip = request.remote_addr
         try:
-            user_id = get_jwt_identity()
-        except:
-            pass
-            
-        log_action(
-            user_id or "anonymous",
-            f"API call: {request.method} {request.endpoint}",
-            extra_data={"ip": request.remote_addr}
-        )
-        
-        return f(*args, **kwargs)
-    return wrapper
\ No newline at end of file
+            return f(*args, **kwargs)
+        finally:
+            # Logged after the handler so the identity role_required verified is on g
+            log_action_async(g.get("jwt_identity") or "anonymous", action, extra_data={"ip": ip})
+    return wrapper
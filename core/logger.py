@@ -2,21 +2,88 @@
 Enhanced audit logging system with structured logging
 """
 
-import json
+import atexit
 import logging
-from datetime import datetime
-from services.database_service import log_to_database
+import orjson
+import queue
+import threading
+import time
+from core.timestamps import utc_now_iso_precise
+from services.database_service import log_to_database_batch
+from config import Config
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Database writes are queued and flushed in batches by a background thread
+LOG_BATCH_SIZE = Config.AUDIT_BUFFER_SIZE
+LOG_MAX_WAIT = Config.AUDIT_FLUSH_INTERVAL  # seconds
+_log_queue = queue.Queue(maxsize=10000)
+_flush_lock = threading.Lock()
+_flush_thread = None
+
+def _to_json(log_entry):
+    """Serialize a log entry for the file log"""
+    return orjson.dumps(log_entry, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+def _drain_log_queue(block):
+    """Take up to LOG_BATCH_SIZE entries, waiting at most LOG_MAX_WAIT for the batch to fill"""
+    entries = []
+    deadline = time.monotonic() + LOG_MAX_WAIT
+    while len(entries) < LOG_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        try:
+            if block and timeout > 0:
+                entries.append(_log_queue.get(timeout=timeout))
+            else:
+                entries.append(_log_queue.get_nowait())
+        except queue.Empty:
+            break
+    return entries
+
+def _run_log_flusher():
+    while True:
+        entries = [_log_queue.get()]
+        entries.extend(_drain_log_queue(block=True))
+        with _flush_lock:
+            if not log_to_database_batch(entries):
+                logger.error(f"Failed to log {len(entries)} entries to database")
+
+def flush_log_queue():
+    """Write out everything still queued"""
+    with _flush_lock:
+        while True:
+            entries = _drain_log_queue(block=False)
+            if not entries:
+                break
+            if not log_to_database_batch(entries):
+                logger.error(f"Failed to log {len(entries)} entries to database")
+
+atexit.register(flush_log_queue)
+
+def _queue_log_entry(log_entry):
+    """Hand a log entry to the background writer without blocking"""
+    global _flush_thread
+    
+    if _flush_thread is None:
+        with _flush_lock:
+            if _flush_thread is None:
+                # Started lazily so forked workers each get their own flusher
+                _flush_thread = threading.Thread(target=_run_log_flusher, daemon=True)
+                _flush_thread.start()
+    
+    try:
+        _log_queue.put_nowait(log_entry)
+    except queue.Full:
+        logger.error("Audit log queue full, dropping database entry")
+
 def log_action(user_id, action, zone=None, extra_data=None):
     """
     Enhanced logging with structured data
-    Logs to both file and database
+    Logs to file immediately and queues the database write
     """
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_now_iso_precise(),
         "user_id": user_id,
         "action": action,
         "zone": zone,
@@ -24,42 +91,55 @@ def log_action(user_id, action, zone=None, extra_data=None):
     }
     
     # Log to file
-    logger.info(f"Action: {json.dumps(log_entry)}")
+    logger.info(f"Action: {_to_json(log_entry)}")
     
     # Log to database for querying
-    try:
-        log_to_database(log_entry)
-    except Exception as e:
-        logger.error(f"Failed to log to database: {e}")
+    _queue_log_entry(log_entry)
+
+# After a failed enqueue, log inline for a while instead of waiting on the broker each time
+BROKER_RETRY_INTERVAL = 30  # seconds
+_broker_unavailable_until = 0
+
+def log_action_async(user_id, action, zone=None, extra_data=None):
+    """
+    Queue an audit log entry on Celery so the request doesn't wait on the insert.
+    Falls back to logging inline when the broker is unreachable.
+    """
+    global _broker_unavailable_until
+    
+    if time.time() >= _broker_unavailable_until:
+        try:
+            from celery_app import log_action_task
+            log_action_task.delay(user_id, action, zone, extra_data)
+            return
+        except Exception as e:
+            logger.warning(f"Could not queue audit log, logging inline: {e}")
+            _broker_unavailable_until = time.time() + BROKER_RETRY_INTERVAL
+    
+    log_action(user_id, action, zone, extra_data)
 
 def log_energy_decision(decision_data):
     """Log optimization decisions"""
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_now_iso_precise(),
         "type": "energy_decision",
         "decision": decision_data
     }
     
-    logger.info(f"Energy Decision: {json.dumps(log_entry)}")
+    logger.info(f"Energy Decision: {_to_json(log_entry)}")
     
-    try:
-        log_to_database(log_entry)
-    except Exception as e:
-        logger.error(f"Failed to log energy decision: {e}")
+    _queue_log_entry(log_entry)
 
 def log_emergency(emergency_type, details):
     """Log emergency events"""
     log_entry = {
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": utc_now_iso_precise(),
         "type": "emergency",
         "emergency_type": emergency_type,
         "details": details,
         "severity": "HIGH"
     }
     
-    logger.critical(f"Emergency: {json.dumps(log_entry)}")
+    logger.critical(f"Emergency: {_to_json(log_entry)}")
     
-    try:
-        log_to_database(log_entry)
-    except Exception as e:
-        logger.error(f"Failed to log emergency: {e}")
\ No newline at end of file
+    _queue_log_entry(log_entry)
\ No newline at end of file
@@ -0,0 +1,18 @@
+"""
+Request parameter helpers for bounded list endpoints
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def safe_limit(raw, default=50, cap=500):
+    """Parse a client-supplied page size, clamped to 1..cap"""
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        return default
+    
+    if limit > cap:
+        logger.warning(f"Requested limit {limit} exceeds cap {cap}")
+    return max(1, min(limit, cap))
@@ -0,0 +1,32 @@
+"""
+Cheap UTC timestamps for hot request paths
+"""
+
+import time
+from datetime import datetime
+
+# (epoch second, formatted string) - swapped as one tuple so readers never see a torn pair
+_cached_timestamp = (None, "")
+
+def utc_now_iso():
+    """Current UTC time as an ISO-8601 string, formatted at most once per second"""
+    global _cached_timestamp
+    
+    second = int(time.time())
+    cached_second, cached_iso = _cached_timestamp
+    if second != cached_second:
+        cached_iso = datetime.utcfromtimestamp(second).isoformat()
+        _cached_timestamp = (second, cached_iso)
+    return cached_iso
+
+def utc_now_iso_precise():
+    """Current UTC time as an ISO-8601 string with microseconds, reusing the cached seconds prefix"""
+    global _cached_timestamp
+    
+    now_ns = time.time_ns()
+    second, nanos = divmod(now_ns, 1_000_000_000)
+    cached_second, cached_iso = _cached_timestamp
+    if second != cached_second:
+        cached_iso = datetime.utcfromtimestamp(second).isoformat()
+        _cached_timestamp = (second, cached_iso)
+    return f"{cached_iso}.{nanos // 1000:06d}"
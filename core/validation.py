@@ -0,0 +1,9 @@
+"""
+Request payload helpers for device readings
+"""
+
+import math
+
+def is_reading(value):
+    """True for a finite int/float sensor reading; bools and numeric strings are rejected"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for production deployment
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Requests mostly wait on Firebase/Postgres, so threads per worker scale well
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = 30
+
+# Dashboards poll /alerts/history and /energy/status; let them reuse the connection.
+# With gthread, idle keep-alive sockets wait in the poller instead of holding a thread
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 30))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+def worker_exit(server, worker):
+    """Stop the background services in the worker that runs them (RUN_BG_SERVICES=1)"""
+    from config import Config
+    if not Config.RUN_BG_SERVICES:
+        return
+    
+    # The sensor listener's stream thread is non-daemon; without this the worker
+    # hangs on exit and the atexit buffer flushes never run
+    from services.background_service import stop_background_tasks
+    from services.watchdog_service import stop_watchdog
+    stop_watchdog()
+    stop_background_tasks()
@@ -1,9 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 from flask import Blueprint, request, jsonify
-from services.firebase_service import get_document, set_document, query_collection
+from services.firebase_service import set_document, update_document, query_collection, get_cached_collection
 from core.decorators import role_required, log_api_call
 
 admin_bp = Blueprint("admin", __name__)
 
+# Shared pool for fanning out independent Firebase reads
+_query_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="admin-query")
+
 @admin_bp.route("/control", methods=["POST"])
 @log_api_call
 @role_required("admin")
@@ -16,7 +20,7 @@ def control(user_data):
     if not zone or not action:
         return jsonify({"message": "Zone and action required"}), 400
 
-    set_document("zones", zone, {"status": action})
+    update_document(f"zones/{zone}", {"status": action})
     return jsonify({"message": f"Zone {zone} set to {action}"})
 
 
@@ -25,9 +29,12 @@ def control(user_data):
 @role_required("admin")
 def overview(user_data):
     """Get system overview from Firebase"""
-    households = query_collection("households")
-    zones = query_collection("zones")
-    alerts = query_collection("alerts", order_by="timestamp", limit=10)
+    # The three reads are independent, so run them concurrently
+    households = _query_executor.submit(query_collection, "households")
+    zones = _query_executor.submit(get_cached_collection, "zones")
+    alerts = _query_executor.submit(query_collection, "alerts", order_by="timestamp", limit=10, descending=True)
+
+    households, zones, alerts = households.result(), zones.result(), alerts.result()
 
     return jsonify({
         "households": households,
@@ -42,7 +49,7 @@ def overview(user_data):
 def optimize(user_data):
     """Trigger optimization manually"""
     # just flag in firebase for optimizer service
-    set_document("system", "optimizer_trigger", {"status": "pending"})
+    set_document("system/optimizer_trigger", {"status": "pending"})
     return jsonify({"message": "Optimization triggered"})
 
 
@@ -51,7 +58,7 @@ def optimize(user_data):
 @role_required("admin")
 def logs(user_data):
     """Fetch audit logs"""
-    logs = query_collection("logs", order_by="timestamp", limit=50)
+    logs = query_collection("logs", order_by="timestamp", limit=50, descending=True)
     return jsonify({"logs": logs})
 
 
@@ -67,7 +74,7 @@ def message(user_data):
     if not household_id or not message:
         return jsonify({"message": "household_id and message required"}), 400
 
-    set_document("households/{}/messages".format(household_id), "latest", {
+    set_document(f"households/{household_id}/messages/latest", {
         "from": user_data["id"],
         "message": message
     })
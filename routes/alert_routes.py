@@ -1,31 +1,74 @@
 from flask import Blueprint, request, jsonify
-from services.firebase_service import query_collection, add_document
+from services.firebase_service import query_collection, add_document, get_document
 from core.decorators import role_required, log_api_call
-from core.logger import log_action
+from core.logger import log_action_async
+from core.pagination import safe_limit
+from celery_app import store_alert_task
 import logging
 
 logger = logging.getLogger(__name__)
 alert_bp = Blueprint("alerts", __name__)
 
+# Fields the history list renders; the full message is served by the detail endpoint
+ALERT_LIST_FIELDS = ("alert_type", "message", "recipient", "severity", "status", "zones", "timestamp")
+MESSAGE_PREVIEW_LENGTH = 140
+
+def _alert_preview(alert_id, alert):
+    """List view of an alert with the message cut down to a preview"""
+    message = alert.get("message") or ""
+    return {
+        **alert,
+        "id": alert_id,
+        "message": message[:MESSAGE_PREVIEW_LENGTH],
+        "truncated": len(message) > MESSAGE_PREVIEW_LENGTH
+    }
+
 @alert_bp.route("/history", methods=["GET"])
 @log_api_call
 @role_required("admin")
 def get_alert_history(user_data):
     """Get alert history from Firebase"""
     try:
-        limit = int(request.args.get("limit", 50))
+        limit = safe_limit(request.args.get("limit"))
         severity = request.args.get("severity")
+        before_id = request.args.get("before_id")
 
-        filters = [("severity", "==", severity)] if severity else []
-        alerts = query_collection("alerts", filters=filters, order_by="timestamp", limit=limit)
+        # Alert keys are Firebase push IDs, which sort chronologically, so page
+        # backwards by key from the cursor instead of reading and skipping
+        page = query_collection("alerts", limit=limit, end_before=before_id, descending=True, fields=ALERT_LIST_FIELDS)
+        keys = list(page)
+        next_cursor = keys[-1] if len(keys) == limit else None
 
-        return jsonify({"alerts": alerts})
+        alerts = [
+            _alert_preview(key, page[key])
+            for key in keys
+            if not severity or page[key].get("severity") == severity
+        ]
+
+        return jsonify({"alerts": alerts, "next_cursor": next_cursor})
 
     except Exception as e:
         logger.error(f"Get alert history error: {e}")
         return jsonify({"message": "Failed to get alert history"}), 500
 
 
+@alert_bp.route("/<alert_id>", methods=["GET"])
+@log_api_call
+@role_required("admin")
+def get_alert(user_data, alert_id):
+    """Get a single alert with its full message"""
+    try:
+        alert = get_document(f"alerts/{alert_id}")
+        if not alert:
+            return jsonify({"message": "Alert not found"}), 404
+
+        return jsonify({"alert": {**alert, "id": alert_id}})
+
+    except Exception as e:
+        logger.error(f"Get alert error: {e}")
+        return jsonify({"message": "Failed to get alert"}), 500
+
+
 @alert_bp.route("/send", methods=["POST"])
 @log_api_call
 @role_required("admin")
@@ -41,16 +84,21 @@ def send_custom_alert(user_data):
         if not message or not recipient:
             return jsonify({"message": "Message and recipient required"}), 400
 
-        add_document("alerts", {
+        alert = {
             "alert_type": alert_type,
             "message": message,
             "recipient": recipient,
             "severity": severity,
             "status": "sent"
-        })
+        }
+        try:
+            store_alert_task.delay(alert)
+        except Exception as e:
+            logger.warning(f"Could not queue custom alert, storing inline: {e}")
+            add_document("alerts", alert)
 
-        log_action(user_data["id"], f"Sent custom alert to {recipient}")
-        return jsonify({"message": "Alert sent successfully"})
+        log_action_async(user_data["id"], f"Sent custom alert to {recipient}")
+        return jsonify({"message": "Alert accepted"}), 202
 
     except Exception as e:
         logger.error(f"Send custom alert error: {e}")
@@ -76,7 +124,7 @@ def trigger_emergency_alert(user_data):
             "status": "emergency"
         })
 
-        log_action(user_data["id"], f"Emergency alert: {emergency_type}")
+        log_action_async(user_data["id"], f"Emergency alert: {emergency_type}")
         return jsonify({"message": "Emergency alert sent"})
 
     except Exception as e:
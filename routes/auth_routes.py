@@ -1,57 +1,126 @@
 from flask import Blueprint, request, jsonify
-from services.firebase_service import get_document, set_document
+from services.firebase_service import get_document, update_document
+from services.database_service import store_session, get_session, delete_session
+from core.auth import verify_password, reject_password, password_needs_rehash, hash_password
+from core.decorators import rate_limit
+from cachetools import TTLCache
+import hmac
+import threading
 import uuid, time
 
 auth_bp = Blueprint("auth", __name__)
 
-@auth_bp.route("/login", methods=["POST"])
+# User documents change rarely; keep recent ones in memory instead of reading Firebase per request
+_user_cache = TTLCache(maxsize=1024, ttl=60)
+_user_cache_lock = threading.Lock()
+
+
+def _get_user(username):
+    """Fetch a user document, served from the in-process cache when fresh"""
+    with _user_cache_lock:
+        user = _user_cache.get(username)
+    if user is None:
+        user = get_document(f"users/{username}")
+        if user:
+            with _user_cache_lock:
+                _user_cache[username] = user
+    return user
+
+
+def invalidate_user(username):
+    """Drop a cached user document after it changes"""
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
+
+
+def _public_user(user):
+    """User document without credential fields"""
+    return {k: v for k, v in user.items() if k not in ("password", "password_hash")}
+
+
+def _check_password(username, user, password):
+    """Verify a login password, migrating plaintext or outdated hashes to argon2"""
+    if not user:
+        return reject_password(password)
+
+    if "password_hash" in user:
+        if not verify_password(user["password_hash"], password):
+            return False
+    elif not hmac.compare_digest(str(user.get("password", "")).encode(), password.encode()):
+        # Legacy plaintext record - compared in constant time
+        reject_password(password)
+        return False
+
+    if "password" in user or password_needs_rehash(user["password_hash"]):
+        if update_document(f"users/{username}", {"password_hash": hash_password(password), "password": None}):
+            invalidate_user(username)
+    return True
+
+
+@rate_limit(max_requests=10, window=60)
 def login_route():
     data = request.get_json()
     username = data.get("username")
-    password = data.get("password")
+    password = data.get("password") or ""
+    if not isinstance(password, str):
+        return jsonify({"message": "Password must be a string"}), 400
 
-    user = get_document("users", username)
-    if not user or user.get("password") != password:
+    user = _get_user(username) if username else None
+    if not _check_password(username, user, password):
         return jsonify({"message": "Invalid credentials"}), 401
 
     token = str(uuid.uuid4())
-    set_document("sessions", token, {"user": username, "created": time.time()})
+    store_session(token, {"user": username, "created": time.time()})
 
-    return jsonify({"token": token, "user": user})
+    return jsonify({"token": token, "user": _public_user(user)})
 
 
-@auth_bp.route("/refresh", methods=["POST"])
 def refresh_route():
     data = request.get_json()
     old_token = data.get("token")
     if not old_token:
         return jsonify({"message": "Token required"}), 400
 
+    session = get_session(old_token)
+    if not session:
+        return jsonify({"message": "Session not found"}), 401
+
     new_token = str(uuid.uuid4())
-    set_document("sessions", new_token, {"refreshed_from": old_token, "created": time.time()})
+    store_session(new_token, {"user": session["user"], "refreshed_from": old_token, "created": time.time()})
+    delete_session(old_token)
     return jsonify({"token": new_token})
 
 
-@auth_bp.route("/logout", methods=["POST"])
 def logout_route():
     data = request.get_json()
     token = data.get("token")
     if not token:
         return jsonify({"message": "Token required"}), 400
 
-    set_document("sessions", token, {"status": "logged_out"})
+    delete_session(token)
     return jsonify({"message": "Logged out"})
 
 
-@auth_bp.route("/profile", methods=["GET"])
 def profile_route():
     token = request.headers.get("Authorization")
     if not token:
         return jsonify({"message": "Unauthorized"}), 401
 
-    session = get_document("sessions", token)
+    session = get_session(token)
     if not session:
         return jsonify({"message": "Session not found"}), 404
 
-    user = get_document("users", session["user"])
-    return jsonify({"user": user})
+    user = _get_user(session["user"])
+    return jsonify({"user": _public_user(user) if user else None})
+
+
+# Registered from one table rather than per-function decorators
+ROUTES = [
+    ("/login", ["POST"], login_route),
+    ("/refresh", ["POST"], refresh_route),
+    ("/logout", ["POST"], logout_route),
+    ("/profile", ["GET"], profile_route),
+]
+
+for path, methods, view_func in ROUTES:
+    auth_bp.add_url_rule(path, endpoint=view_func.__name__, view_func=view_func, methods=methods)
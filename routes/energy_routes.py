@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
-from services.firebase_service import get_document, set_document, query_collection, add_document
+from services.firebase_service import set_document, get_cached_query, get_cached_collection, add_document, write_buffer
 from core.decorators import role_required, log_api_call
+from core.validation import is_reading
+from config import Config
 import time
 
 energy_bp = Blueprint("energy", __name__)
@@ -8,7 +10,7 @@ energy_bp = Blueprint("energy", __name__)
 @energy_bp.route("/status", methods=["GET"])
 @log_api_call
 def status():
-    zones = query_collection("zones")
+    zones = get_cached_collection("zones")
     return jsonify({"zones": zones})
 
 
@@ -21,7 +23,15 @@ def update_voltage_route():
     if not zone or voltage is None:
         return jsonify({"message": "Zone and voltage required"}), 400
 
-    set_document("zones", zone, {"voltage": voltage})
+    if not is_reading(voltage):
+        return jsonify({"message": "Voltage must be a number"}), 400
+
+    if zone not in Config.ZONE_NAMES:
+        return jsonify({"message": "Invalid zone"}), 400
+
+    # Bursts of ESP32 updates are coalesced into one Firebase write
+    write_buffer.write(f"zones/{zone}/voltage", voltage)
+    write_buffer.write(f"zones/{zone}/lastUpdated", time.time())
     return jsonify({"message": "Voltage updated"})
 
 
@@ -31,7 +41,7 @@ def update_voltage_route():
 def history(user_data):
     zone = request.args.get("zone")
     filters = [("zone", "==", zone)] if zone else []
-    history = query_collection("energy_history", filters=filters, order_by="timestamp", limit=100)
+    history = get_cached_query("energy_history", filters=filters, order_by="timestamp", limit=100, descending=True)
     return jsonify({"history": history})
 
 
@@ -39,7 +49,7 @@ def history(user_data):
 @log_api_call
 @role_required("admin")
 def optimize(user_data):
-    set_document("system", "optimizer_trigger", {"status": "pending"})
+    set_document("system/optimizer_trigger", {"status": "pending"})
     return jsonify({"message": "Optimization started"})
 
 
@@ -47,5 +57,5 @@ def optimize(user_data):
 @log_api_call
 @role_required("admin")
 def predictions(user_data):
-    predictions = query_collection("predictions", order_by="timestamp", limit=10)
+    predictions = get_cached_query("predictions", order_by="timestamp", limit=10, descending=True)
     return jsonify({"predictions": predictions})
@@ -1,15 +1,18 @@
 from flask import Blueprint, request, jsonify
-from services.firebase_service import get_document, query_collection, set_document
+from services.firebase_service import get_document, query_collection, update_document
 from core.decorators import role_required, log_api_call
 
 household_bp = Blueprint("household", __name__)
 
+# Fields the notification list renders
+NOTIFICATION_FIELDS = ("title", "body", "type", "status", "read", "timestamp")
+
 @household_bp.route("/status", methods=["GET"])
 @log_api_call
 @role_required("household")
 def status(user_data):
     household_id = user_data["id"]
-    data = get_document("households", household_id)
+    data = get_document(f"households/{household_id}")
     return jsonify({"household": data})
 
 
@@ -24,7 +27,7 @@ def control(user_data):
     if not zone or not action:
         return jsonify({"message": "Zone and action required"}), 400
 
-    set_document("zones", zone, {"status": action})
+    update_document(f"zones/{zone}", {"status": action})
     return jsonify({"message": f"Zone {zone} set to {action}"})
 
 
@@ -33,7 +36,10 @@ def control(user_data):
 @role_required("household")
 def notifications(user_data):
     household_id = user_data["id"]
-    notifications = query_collection("households/{}/notifications".format(household_id), order_by="timestamp", limit=20)
+    notifications = query_collection(
+        "households/{}/notifications".format(household_id),
+        order_by="timestamp", limit=20, descending=True, fields=NOTIFICATION_FIELDS
+    )
     return jsonify({"notifications": notifications})
 
 
@@ -48,5 +54,5 @@ def mark_read(user_data):
     if not notif_id:
         return jsonify({"message": "Notification ID required"}), 400
 
-    set_document("households/{}/notifications".format(household_id), notif_id, {"status": "read"})
+    update_document(f"households/{household_id}/notifications/{notif_id}", {"status": "read"})
     return jsonify({"message": "Notification marked as read"})
@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
-from services.firebase_service import get_collection
+from services.firebase_service import get_request_sensor_data
 from services.optimization_service import energy_optimizer
 from core.decorators import role_required, log_api_call
-from core.logger import log_action
+from core.logger import log_action_async
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,12 +14,13 @@ scenario_bp = Blueprint("scenario", __name__)
 def apply(user_data):
     """Apply optimization scenarios"""
     try:
-        sensor_data = [doc.to_dict() for doc in get_collection("sensors").stream()]
+        # Cached snapshot keyed by zone, which is the shape the optimizer expects
+        sensor_data = get_request_sensor_data()
         if not sensor_data:
             return jsonify({"message": "No sensor data available"}), 404
 
         result = energy_optimizer.optimize_energy_allocation(sensor_data)
-        log_action(user_data["id"], "Applied optimization scenario", extra_data={"result": result})
+        log_action_async(user_data["id"], "Applied optimization scenario", extra_data={"result": result})
 
         return jsonify({"message": "Scenario applied successfully", "result": result})
     except Exception as e:
@@ -46,15 +47,14 @@ def get_schedule(user_data):
 def simulate(user_data):
     try:
         data = request.get_json()
-        sensor_data = data.get("sensor_data") or [doc.to_dict() for doc in get_collection("sensors").stream()]
+        sensor_data = data.get("sensor_data") or get_request_sensor_data()
         if not sensor_data:
             return jsonify({"message": "No sensor data available"}), 404
 
-        result = energy_optimizer.optimize_energy_allocation(sensor_data)
-        if "execution_results" in result:
-            del result["execution_results"]
+        # Simulation only - don't send the resulting commands to the relays
+        result = energy_optimizer.optimize_energy_allocation(sensor_data, execute=False)
 
-        log_action(user_data["id"], "Ran optimization simulation", extra_data={"simulation_result": result})
+        log_action_async(user_data["id"], "Ran optimization simulation", extra_data={"simulation_result": result})
         return jsonify({"message": "Simulation completed", "simulation_result": result})
     except Exception as e:
         logger.error(f"Simulation error: {e}")
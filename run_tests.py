@@ -3,6 +3,7 @@ Test runner script
 """
 
 import pytest
+import importlib.util
 import sys
 import os
 
@@ -11,11 +12,17 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 if __name__ == "__main__":
     # Run tests with verbose output
-    exit_code = pytest.main([
+    args = [
         "tests/",
         "-v",
         "--tb=short",
         "--color=yes"
-    ])
+    ]
+    
+    # Spread the modules over all cores when pytest-xdist is installed
+    if importlib.util.find_spec("xdist"):
+        args += ["-n", "auto"]
+    
+    exit_code = pytest.main(args)
     
     sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+One-off migration of the original pickled models to models.npz
+
+Run once from the project root, on a host that trusts the .pkl files:
+    python -m scripts.migrate_legacy_models
+The anomaly envelope is not in the old files; it comes with the next retrain.
+"""
+
+import os
+import pickle
+import sys
+
+from services.ml_service import MODELS_DIR, MODEL_ARRAYS_PATH, ml_service
+
+LEGACY_MODEL_FILES = {
+    "battery": "battery_model.pkl",
+    "demand": "demand_model.pkl"
+}
+
+
+def main():
+    if os.path.exists(MODEL_ARRAYS_PATH):
+        print(f"{MODEL_ARRAYS_PATH} already exists, nothing to migrate")
+        return 0
+
+    models = {}
+    for key, filename in LEGACY_MODEL_FILES.items():
+        path = f"{MODELS_DIR}/{filename}"
+        if not os.path.exists(path):
+            print(f"Missing {path}")
+            return 1
+        with open(path, "rb") as f:
+            models[key] = pickle.load(f)
+
+    ml_service.battery_model = models["battery"]
+    ml_service.demand_model = models["demand"]
+    ml_service._save_models()
+    print(f"Wrote {MODEL_ARRAYS_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
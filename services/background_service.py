@@ -4,11 +4,12 @@ Runs periodic tasks using schedule
 """
 
 import schedule
-import time
 import threading
 import logging
-from datetime import datetime
-from services.firebase_service import get_sensor_data
+import time
+from services.firebase_service import (
+    get_sensor_data, get_sensor_data_changes, start_sensor_listener, stop_sensor_listener, add_documents_batch
+)
 from services.optimization_service import energy_optimizer
 from services.notification_service import notification_service
 from services.ml_service import ml_service
@@ -16,15 +17,29 @@ from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Zone config is static, so resolve the critical zones once
+_CRITICAL_ZONES = frozenset(Config.ZONES_BY_TYPE.get("critical", ()))
+_CRITICAL_NAMES = {zone: Config.ZONES[zone]["name"] for zone in _CRITICAL_ZONES}
+
 class BackgroundMonitor:
+    BATTERY_ALERT_INTERVAL = 3600  # seconds between low-battery notifications
+    OPTIMIZATION_INTERVAL = 300  # minimum seconds between optimization runs
+    
     def __init__(self):
         self.running = False
-        self.last_battery_alert = None
-        self.last_optimization = None
+        self.stop_event = threading.Event()
+        # time.monotonic() readings; -inf means "never"
+        self.last_battery_alert = float("-inf")
+        self.last_optimization = float("-inf")
+        self.last_sensor_changes = None
         
     def start(self):
         """Start background monitoring"""
         self.running = True
+        self.stop_event.clear()
+        
+        # Sensor updates are pushed into memory, so monitoring reads local state
+        start_sensor_listener()
         
         # Schedule periodic tasks
         schedule.every(30).seconds.do(self.monitor_system)
@@ -41,84 +56,122 @@ class BackgroundMonitor:
     def stop(self):
         """Stop background monitoring"""
         self.running = False
+        self.stop_event.set()
+        # The listener's stream thread would otherwise keep the process alive
+        stop_sensor_listener()
         logger.info("Background monitoring stopped")
     
     def _run_scheduler(self):
-        """Run the scheduler loop"""
+        """Run the scheduler loop, sleeping until the next job is due"""
         while self.running:
             schedule.run_pending()
-            time.sleep(1)
+            # Wakes early only when stop() is called
+            idle_seconds = schedule.idle_seconds()
+            self.stop_event.wait(max(idle_seconds, 0) if idle_seconds is not None else None)
     
     def monitor_system(self):
         """Monitor system for emergencies and alerts"""
         try:
+            # Nothing to re-check if the listener hasn't pushed any change since the last tick
+            sensor_changes = get_sensor_data_changes()
+            if sensor_changes is not None and sensor_changes == self.last_sensor_changes:
+                return
+            self.last_sensor_changes = sensor_changes
+            
             sensor_data = get_sensor_data()
             if not sensor_data:
                 return
             
-            self._check_battery_levels(sensor_data)
-            self._check_anomalies(sensor_data)
-            self._check_zone_status(sensor_data)
+            # One clock reading shared by every check in this tick
+            now = time.monotonic()
+            
+            # Checks collect emergency alerts; they are recorded and sent together below
+            alerts = []
+            self._check_battery_levels(sensor_data, alerts, now)
+            self._check_anomalies(sensor_data, alerts)
+            self._check_zone_status(sensor_data, alerts)
+            self._dispatch_alerts(alerts)
             
         except Exception as e:
             logger.error(f"System monitoring error: {e}")
     
-    def _check_battery_levels(self, sensor_data):
+    def _dispatch_alerts(self, alerts):
+        """Record this tick's emergency alerts in one write and send one notification per alert type"""
+        if not alerts:
+            return
+        
+        add_documents_batch("alerts", [{
+            "alert_type": alert_type,
+            "message": details,
+            "severity": "CRITICAL",
+            "zones": [zone],
+            "status": "emergency"
+        } for alert_type, details, zone in alerts])
+        
+        alerts_by_type = {}
+        for alert_type, details, zone in alerts:
+            alerts_by_type.setdefault(alert_type, []).append((details, zone))
+        
+        for alert_type, entries in alerts_by_type.items():
+            notification_service.send_emergency_alert(
+                alert_type,
+                "; ".join(details for details, _ in entries),
+                [zone for _, zone in entries]
+            )
+    
+    def _check_battery_levels(self, sensor_data, alerts, now):
         """Check battery levels and send alerts"""
         for zone, data in sensor_data.items():
             battery_percentage = data.get("batteryPercentage", 50)
             
             if battery_percentage < Config.EMERGENCY_BATTERY_THRESHOLD:
-                if zone in Config.ZONES and Config.ZONES[zone]["type"] == "critical":
-                    notification_service.send_emergency_alert(
+                if zone in _CRITICAL_ZONES:
+                    alerts.append((
                         "CRITICAL_BATTERY_FAILURE",
                         f"Critical zone {zone} battery at {battery_percentage:.1f}%",
-                        [zone]
-                    )
+                        zone
+                    ))
             
             elif battery_percentage < Config.LOW_BATTERY_THRESHOLD:
-                current_time = datetime.utcnow()
-                if (not self.last_battery_alert or 
-                    (current_time - self.last_battery_alert).seconds > 3600):
+                if now - self.last_battery_alert > self.BATTERY_ALERT_INTERVAL:
                     notification_service.send_low_battery_alert(
                         battery_percentage, 
                         [zone]
                     )
-                    self.last_battery_alert = current_time
+                    self.last_battery_alert = now
     
-    def _check_anomalies(self, sensor_data):
+    def _check_anomalies(self, sensor_data, alerts):
         """Check for anomalies in energy data"""
-        for zone, data in sensor_data.items():
-            anomaly_result = ml_service.detect_anomaly(data)
-            
+        # Score every zone with one model call
+        anomaly_results = ml_service.detect_anomaly_batch(list(sensor_data.values()))
+        
+        for zone, anomaly_result in zip(sensor_data, anomaly_results):
             if anomaly_result["hasAnomaly"] and anomaly_result["severity"] == "HIGH":
-                notification_service.send_emergency_alert(
+                alerts.append((
                     "ENERGY_ANOMALY",
                     f"Anomaly detected in {zone}: {', '.join(anomaly_result['anomalies'])}",
-                    [zone]
-                )
+                    zone
+                ))
     
-    def _check_zone_status(self, sensor_data):
+    def _check_zone_status(self, sensor_data, alerts):
         """Check if critical zones are functioning"""
-        for zone, config in Config.ZONES.items():
-            if config["type"] == "critical":
-                zone_data = sensor_data.get(zone, {})
-                relay_state = zone_data.get("relayState", False)
-                battery_level = zone_data.get("batteryPercentage", 0)
-                
-                if not relay_state and battery_level > Config.CRITICAL_BATTERY_THRESHOLD:
-                    notification_service.send_emergency_alert(
-                        "CRITICAL_ZONE_FAILURE",
-                        f"Critical zone {zone} ({config['name']}) is offline with sufficient battery",
-                        [zone]
-                    )
+        for zone, name in _CRITICAL_NAMES.items():
+            zone_data = sensor_data.get(zone, {})
+            relay_state = zone_data.get("relayState", False)
+            battery_level = zone_data.get("batteryPercentage", 0)
+            
+            if not relay_state and battery_level > Config.CRITICAL_BATTERY_THRESHOLD:
+                alerts.append((
+                    "CRITICAL_ZONE_FAILURE",
+                    f"Critical zone {zone} ({name}) is offline with sufficient battery",
+                    zone
+                ))
     
     def run_optimization(self):
         """Run energy optimization"""
         try:
-            current_time = datetime.utcnow()
-            if (self.last_optimization and 
-                (current_time - self.last_optimization).seconds < 300):
+            now = time.monotonic()
+            if now - self.last_optimization < self.OPTIMIZATION_INTERVAL:
                 return
             
             sensor_data = get_sensor_data()
@@ -130,7 +183,7 @@ class BackgroundMonitor:
             
             if result["success"]:
                 logger.info("Optimization completed successfully")
-                self.last_optimization = current_time
+                self.last_optimization = now
             else:
                 logger.error(f"Optimization failed: {result.get('error')}")
                 
@@ -164,3 +217,10 @@ def start_background_tasks():
         background_monitor.start()
     except Exception as e:
         logger.error(f"Failed to start background tasks: {e}")
+
+def stop_background_tasks():
+    """Stop background tasks and close the sensor listener"""
+    try:
+        background_monitor.stop()
+    except Exception as e:
+        logger.error(f"Failed to stop background tasks: {e}")
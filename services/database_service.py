@@ -4,153 +4,262 @@ Handles user management, logging, and data caching
 """
 
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import execute_values, RealDictCursor, Json
 import redis
-import json
+import atexit
+import csv
+import io
+import threading
+from collections import deque
+import orjson
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from config import Config
-from werkzeug.security import generate_password_hash
 
-# Database connection
+# Database connection pool, created on first use so each forked worker gets its own
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Get the shared PostgreSQL connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    Config.DB_POOL_MIN,
+                    Config.DB_POOL_MAX,
+                    Config.POSTGRES_URL
+                )
+    return _pool
+
+def _connection_alive(conn):
+    """Cheap liveness check: poll() reads without a round-trip and fails on a dropped socket"""
+    if conn.closed:
+        return False
+    try:
+        conn.poll()
+        return True
+    except psycopg2.Error:
+        return False
+
 def get_db_connection():
-    """Get PostgreSQL connection"""
+    """Get PostgreSQL connection from the pool, discarding any the server has dropped"""
     try:
-        conn = psycopg2.connect(Config.POSTGRES_URL)
-        return conn
+        pool = _get_pool()
+        # After a database restart every pooled connection may be dead, so allow a full sweep
+        for _ in range(Config.DB_POOL_MAX):
+            conn = pool.getconn()
+            if _connection_alive(conn):
+                return conn
+            pool.putconn(conn, close=True)
+        return pool.getconn()
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
-# Redis connection
-def get_redis_connection():
-    """Get Redis connection for caching"""
+def release_db_connection(conn):
+    """Return a PostgreSQL connection to the pool"""
     try:
-        return redis.from_url(Config.REDIS_URL)
+        if not conn.closed:
+            # Don't hand the next caller a half-finished transaction
+            conn.rollback()
+        _get_pool().putconn(conn, close=bool(conn.closed))
     except Exception as e:
-        print(f"Redis connection error: {e}")
-        return None
+        print(f"Error releasing database connection: {e}")
+
+@contextmanager
+def db_conn():
+    """
+    Borrow a pooled connection for a block: commits when the block succeeds,
+    rolls back when it raises, and always returns the connection to the pool
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise psycopg2.OperationalError("No database connection available")
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+# Redis connection: one thread-safe client over a bounded pool, shared by every cache helper.
+# Connections are opened on first use, and redis-py resets the pool in forked workers
+try:
+    _redis_client = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+        Config.REDIS_URL,
+        max_connections=Config.REDIS_POOL_MAX
+    ))
+except Exception as e:
+    print(f"Redis connection error: {e}")
+    _redis_client = None
+
+def get_redis_connection():
+    """Get Redis connection for caching"""
+    return _redis_client
 
 def initialize_database():
     """Initialize database tables"""
-    conn = get_db_connection()
-    if not conn:
-        return False
-        
     try:
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role VARCHAR(50) NOT NULL,
-                household_id VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Audit logs table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS audit_logs (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                user_id VARCHAR(100),
-                action TEXT NOT NULL,
-                zone VARCHAR(50),
-                extra_data JSONB,
-                ip_address INET
-            )
-        """)
-        
-        # Energy data cache table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS energy_data (
-                id SERIAL PRIMARY KEY,
-                zone VARCHAR(50) NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                battery_voltage FLOAT,
-                input_power FLOAT,
-                output_power FLOAT,
-                solar_generation FLOAT,
-                battery_percentage FLOAT,
-                relay_state BOOLEAN
-            )
-        """)
-        
-        # Optimization decisions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS optimization_decisions (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                decision_data JSONB NOT NULL,
-                battery_level FLOAT,
-                predicted_sustain_hours FLOAT,
-                triggered_by VARCHAR(100)
-            )
-        """)
-        
-        # Alerts table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS alerts (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                alert_type VARCHAR(100) NOT NULL,
-                severity VARCHAR(20) NOT NULL,
-                message TEXT NOT NULL,
-                recipient VARCHAR(255),
-                status VARCHAR(20) DEFAULT 'sent',
-                zone VARCHAR(50)
-            )
-        """)
+        with db_conn() as conn, conn.cursor() as cursor:
+            # Users table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id SERIAL PRIMARY KEY,
+                    email VARCHAR(255) UNIQUE NOT NULL,
+                    password_hash VARCHAR(255) NOT NULL,
+                    role VARCHAR(50) NOT NULL,
+                    household_id VARCHAR(100),
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_login TIMESTAMP,
+                    is_active BOOLEAN DEFAULT TRUE
+                )
+            """)
+            
+            # Audit logs table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS audit_logs (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    user_id VARCHAR(100),
+                    action TEXT NOT NULL,
+                    zone VARCHAR(50),
+                    extra_data JSONB,
+                    ip_address INET
+                )
+            """)
+            
+            # Energy data cache table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS energy_data (
+                    id SERIAL PRIMARY KEY,
+                    zone VARCHAR(50) NOT NULL,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    battery_voltage FLOAT,
+                    input_power FLOAT,
+                    output_power FLOAT,
+                    solar_generation FLOAT,
+                    battery_percentage FLOAT,
+                    relay_state BOOLEAN
+                )
+            """)
+            
+            # Optimization decisions table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS optimization_decisions (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    decision_data JSONB NOT NULL,
+                    battery_level FLOAT,
+                    predicted_sustain_hours FLOAT,
+                    triggered_by VARCHAR(100)
+                )
+            """)
+            
+            # Alerts table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS alerts (
+                    id SERIAL PRIMARY KEY,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    alert_type VARCHAR(100) NOT NULL,
+                    severity VARCHAR(20) NOT NULL,
+                    message TEXT NOT NULL,
+                    recipient VARCHAR(255),
+                    status VARCHAR(20) DEFAULT 'sent',
+                    zone VARCHAR(50)
+                )
+            """)
+            
+            # Read-path indexes: per-zone history windows and recent-first audit log pages.
+            # energy_data is append-only in time order, so a tiny BRIN index covers
+            # the all-zone time-window aggregates
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_energy_zone_ts ON energy_data (zone, timestamp DESC);
+                CREATE INDEX IF NOT EXISTS idx_energy_ts_brin ON energy_data USING BRIN (timestamp);
+                CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_logs (timestamp DESC);
+                CREATE INDEX IF NOT EXISTS idx_audit_user_ts ON audit_logs (user_id, timestamp DESC);
+            """)
+            
+            from core.auth import hash_password
+            
+            # Insert default admin and household users in one statement
+            execute_values(cursor, """
+                INSERT INTO users (email, password_hash, role, household_id) 
+                VALUES %s 
+                ON CONFLICT (email) DO NOTHING
+            """, [
+                ("admin@urjalink.com", hash_password("admin123"), "admin", None),
+                ("house1@urjalink.com", hash_password("house123"), "household", "H001")
+            ])
+            
+        return True
         
-        # Insert default admin user
-        cursor.execute("""
-            INSERT INTO users (email, password_hash, role) 
-            VALUES (%s, %s, %s) 
-            ON CONFLICT (email) DO NOTHING
-        """, ("admin@urjalink.com", generate_password_hash("admin123"), "admin"))
+    except Exception as e:
+        print(f"Database initialization error: {e}")
+        return False
+
+def _get_cached_user(key):
+    """Get a user row cached under user:email:* or user:id:*"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return None
         
-        # Insert default household user
-        cursor.execute("""
-            INSERT INTO users (email, password_hash, role, household_id) 
-            VALUES (%s, %s, %s, %s) 
-            ON CONFLICT (email) DO NOTHING
-        """, ("house1@urjalink.com", generate_password_hash("house123"), "household", "H001"))
+    try:
+        cached = redis_client.get(key)
+        return orjson.loads(cached) if cached else None
+    except Exception as e:
+        print(f"Error getting cached user: {e}")
+        return None
+
+def _cache_user(key, user):
+    """Cache a user row briefly so repeated lookups skip PostgreSQL"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+    try:
+        redis_client.setex(key, Config.USER_CACHE_TTL, orjson.dumps(user))
         return True
+    except Exception as e:
+        print(f"Error caching user: {e}")
+        return False
+
+def invalidate_cached_user(user):
+    """Drop the cached rows for a user after their record changes"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
         
+    try:
+        redis_client.delete(f"user:email:{user['email']}", f"user:id:{user['id']}")
+        return True
     except Exception as e:
-        print(f"Database initialization error: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
+        print(f"Error invalidating cached user: {e}")
         return False
 
 def get_user_by_email(email):
     """Get user by email"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-        
+    cache_key = f"user:email:{email}"
+    user = _get_cached_user(cache_key)
+    if user:
+        return user
+    
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, email, password_hash, role, household_id, is_active 
-            FROM users WHERE email = %s AND is_active = TRUE
-        """, (email,))
-        
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with db_conn() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, email, password_hash, role, household_id, is_active 
+                FROM users WHERE email = %s AND is_active = TRUE
+            """, (email,))
+            row = cursor.fetchone()
         
         if row:
-            return {
+            user = {
                 "id": str(row[0]),
                 "email": row[1],
                 "password_hash": row[2],
@@ -158,77 +267,139 @@ def get_user_by_email(email):
                 "householdId": row[4],
                 "is_active": row[5]
             }
+            _cache_user(cache_key, user)
+            return user
         return None
         
     except Exception as e:
         print(f"Error fetching user: {e}")
-        if conn:
-            conn.close()
         return None
 
 def get_user_by_id(user_id):
     """Get user by ID"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-        
+    cache_key = f"user:id:{user_id}"
+    user = _get_cached_user(cache_key)
+    if user:
+        return user
+    
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, email, role, household_id, is_active 
-            FROM users WHERE id = %s AND is_active = TRUE
-        """, (user_id,))
-        
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with db_conn() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT id, email, role, household_id, is_active 
+                FROM users WHERE id = %s AND is_active = TRUE
+            """, (user_id,))
+            row = cursor.fetchone()
         
         if row:
-            return {
+            user = {
                 "id": str(row[0]),
                 "email": row[1],
                 "role": row[2],
                 "householdId": row[3],
                 "is_active": row[4]
             }
+            _cache_user(cache_key, user)
+            return user
         return None
         
     except Exception as e:
         print(f"Error fetching user by ID: {e}")
-        if conn:
-            conn.close()
         return None
 
 def log_to_database(log_entry):
-    """Log entry to database"""
-    conn = get_db_connection()
-    if not conn:
-        return False
-        
+    """Log a single entry to the database; request paths queue through core.logger instead"""
+    return log_to_database_batch([log_entry])
+
+def _jsonb_dumps(obj):
+    """orjson encoder for JSONB parameters; stringifies anything it can't encode natively"""
+    return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+def _audit_log_row(log_entry):
+    """Convert a log entry to an audit_logs row"""
+    if "action" in log_entry:
+        action = log_entry["action"]
+        extra_data = log_entry.get("extra_data", {})
+    else:
+        # System events (optimizer decisions, emergencies) carry their type instead of an action
+        action = log_entry.get("emergency_type") or log_entry.get("type") or "system_event"
+        extra_data = {key: value for key, value in log_entry.items() if key != "timestamp"}
+    return (
+        log_entry.get("user_id"),
+        action,
+        log_entry.get("zone"),
+        Json(extra_data, dumps=_jsonb_dumps),
+        extra_data.get("ip"),
+        # When the event happened, not when the batch reached the database
+        log_entry.get("timestamp")
+    )
+
+def _insert_audit_rows(rows):
+    """INSERT audit_logs rows in one statement"""
+    with db_conn() as conn, conn.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO audit_logs (user_id, action, zone, extra_data, ip_address, timestamp)
+            VALUES %s
+        """, rows, template="(%s, %s, %s, %s, %s, COALESCE(%s::timestamp, CURRENT_TIMESTAMP))")
+
+def log_to_database_batch(log_entries):
+    """Log several entries to the database in a single INSERT"""
+    rows = [_audit_log_row(log_entry) for log_entry in log_entries]
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO audit_logs (user_id, action, zone, extra_data, ip_address)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            log_entry.get("user_id"),
-            log_entry.get("action"),
-            log_entry.get("zone"),
-            json.dumps(log_entry.get("extra_data", {})),
-            log_entry.get("extra_data", {}).get("ip")
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        _insert_audit_rows(rows)
         return True
-        
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        print(f"Error logging batch to database, retrying row by row: {e}")
     except Exception as e:
-        print(f"Error logging to database: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
+        print(f"Error logging batch to database: {e}")
         return False
+    
+    # One bad row fails the whole INSERT; write the rest individually so only it is lost
+    logged = 0
+    for row in rows:
+        try:
+            _insert_audit_rows([row])
+            logged += 1
+        except Exception as e:
+            print(f"Error logging entry to database: {e}")
+    return logged == len(rows)
+
+def get_recent_audit_logs(limit=100):
+    """Get the most recent audit logs, briefly cached for polling dashboards"""
+    cache_key = f"audit_logs:{limit}"
+    redis_client = get_redis_connection()
+    if redis_client:
+        try:
+            cached = redis_client.get(cache_key)
+            if cached:
+                return orjson.loads(cached)
+        except Exception as e:
+            print(f"Error getting cached audit logs: {e}")
+    
+    try:
+        # The page is capped by the caller and cached whole, so a plain cursor is enough;
+        # RealDictCursor hands back rows already keyed by column name
+        with db_conn() as conn, conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("""
+                SELECT timestamp, user_id, action, zone, extra_data
+                FROM audit_logs
+                ORDER BY timestamp DESC
+                LIMIT %s
+            """, (limit,))
+            
+            # Timestamps stay datetimes; orjson serializes them for the cache and the response
+            logs = cursor.fetchall()
+        
+    except Exception as e:
+        print(f"Error getting audit logs: {e}")
+        return None
+    
+    if redis_client:
+        try:
+            # Cache for 5 seconds
+            redis_client.setex(cache_key, 5, orjson.dumps(logs))
+        except Exception as e:
+            print(f"Error caching audit logs: {e}")
+    return logs
 
 def cache_energy_data(zone, data):
     """Cache energy data in Redis"""
@@ -241,7 +412,7 @@ def cache_energy_data(zone, data):
         redis_client.setex(
             f"energy_data:{zone}",
             300,
-            json.dumps(data)
+            orjson.dumps(data)
         )
         return True
     except Exception as e:
@@ -256,78 +427,401 @@ def get_cached_energy_data(zone):
         
     try:
         data = redis_client.get(f"energy_data:{zone}")
-        return json.loads(data) if data else None
+        return orjson.loads(data) if data else None
     except Exception as e:
         print(f"Error getting cached data: {e}")
         return None
 
-def store_energy_data(zone, data):
-    """Store energy data in PostgreSQL"""
-    conn = get_db_connection()
-    if not conn:
+def cache_energy_data_bulk(zone_data):
+    """Cache energy data for several zones in one pipelined round-trip"""
+    redis_client = get_redis_connection()
+    if not redis_client:
         return False
         
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO energy_data 
-            (zone, battery_voltage, input_power, output_power, solar_generation, 
-             battery_percentage, relay_state)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
+        pipe = redis_client.pipeline(transaction=False)
+        for zone, data in zone_data.items():
+            pipe.setex(f"energy_data:{zone}", 300, orjson.dumps(data))
+        pipe.execute()
+        return True
+    except Exception as e:
+        print(f"Error caching bulk energy data: {e}")
+        return False
+
+def get_cached_energy_data_bulk(zones):
+    """Get cached energy data for several zones with one MGET; missing zones map to None"""
+    zones = list(zones)
+    redis_client = get_redis_connection()
+    if not redis_client or not zones:
+        return dict.fromkeys(zones)
+        
+    try:
+        values = redis_client.mget([f"energy_data:{zone}" for zone in zones])
+        return {zone: orjson.loads(data) if data else None for zone, data in zip(zones, values)}
+    except Exception as e:
+        print(f"Error getting bulk cached data: {e}")
+        return dict.fromkeys(zones)
+
+def publish_energy_updates(zones):
+    """
+    Drop the cached energy data for zones with new rows and announce them on
+    energy:<zone>, so other workers and dashboards don't wait out the cache TTL
+    """
+    redis_client = get_redis_connection()
+    if not redis_client or not zones:
+        return False
+        
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for zone in zones:
+            pipe.delete(f"energy_data:{zone}")
+            pipe.publish(f"energy:{zone}", b"1")
+        pipe.execute()
+        return True
+    except Exception as e:
+        print(f"Error publishing energy updates: {e}")
+        return False
+
+def cache_sensor_data(data):
+    """Cache the latest Firebase sensor snapshot in Redis"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
+        
+    try:
+        redis_client.setex(
+            "sensor_data",
+            Config.SENSOR_CACHE_TTL,
+            orjson.dumps({"fetchedAt": time.time(), "data": data})
+        )
+        return True
+    except Exception as e:
+        print(f"Error caching sensor data: {e}")
+        return False
+
+def get_cached_sensor_data():
+    """Get the cached sensor snapshot, or None if missing or stale"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return None
+        
+    try:
+        cached = redis_client.get("sensor_data")
+        if not cached:
+            return None
+        payload = orjson.loads(cached)
+        if time.time() - payload["fetchedAt"] > Config.SENSOR_CACHE_TTL:
+            return None
+        return payload["data"]
+    except Exception as e:
+        print(f"Error getting cached sensor data: {e}")
+        return None
+
+def invalidate_sensor_cache():
+    """Drop the cached sensor snapshot after a write"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
+        
+    try:
+        redis_client.delete("sensor_data")
+        return True
+    except Exception as e:
+        print(f"Error invalidating sensor cache: {e}")
+        return False
+
+def store_session(token, session, ttl=None):
+    """Store a login session in Redis; it expires on its own after the session lifetime"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
+        
+    try:
+        redis_client.setex(f"sess:{token}", ttl or Config.SESSION_TTL, orjson.dumps(session))
+        return True
+    except Exception as e:
+        print(f"Error storing session: {e}")
+        return False
+
+def get_session(token):
+    """Get a login session from Redis, or None if missing or expired"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return None
+        
+    try:
+        session = redis_client.get(f"sess:{token}")
+        return orjson.loads(session) if session else None
+    except Exception as e:
+        print(f"Error getting session: {e}")
+        return None
+
+def delete_session(token):
+    """End a login session"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
+        
+    try:
+        redis_client.delete(f"sess:{token}")
+        return True
+    except Exception as e:
+        print(f"Error deleting session: {e}")
+        return False
+
+def cache_optimization_result(key, result):
+    """Cache a simulated optimization result for a sensor snapshot"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return False
+        
+    try:
+        # Cache for 2 seconds - long enough to absorb dashboard polling
+        redis_client.setex(f"optimization:{key}", 2, orjson.dumps(result))
+        return True
+    except Exception as e:
+        print(f"Error caching optimization result: {e}")
+        return False
+
+def get_cached_optimization_result(key):
+    """Get a cached simulated optimization result"""
+    redis_client = get_redis_connection()
+    if not redis_client:
+        return None
+        
+    try:
+        data = redis_client.get(f"optimization:{key}")
+        return orjson.loads(data) if data else None
+    except Exception as e:
+        print(f"Error getting cached optimization result: {e}")
+        return None
+
+def store_energy_data(zone, data):
+    """Store energy data in PostgreSQL with the next batched insert"""
+    queue_energy_data(zone, data)
+    return True
+
+_ENERGY_COLUMNS = """
+    (zone, timestamp, battery_voltage, input_power, output_power, 
+     solar_generation, battery_percentage, relay_state)
+"""
+
+def store_energy_data_bulk(cursor, rows):
+    """COPY energy_data rows (in _ENERGY_COLUMNS order) through the cursor"""
+    buffer = io.StringIO()
+    # In CSV format an unquoted empty field is NULL, which is how csv writes None
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY energy_data {_ENERGY_COLUMNS} FROM STDIN WITH (FORMAT csv)", buffer)
+
+class EnergyWriteBuffer:
+    """
+    Buffer energy_data rows in memory and insert them in batches, so a burst
+    of device updates becomes one multi-row INSERT instead of one transaction each
+    """
+    
+    def __init__(self, flush_interval=Config.ENERGY_FLUSH_INTERVAL, batch_size=Config.ENERGY_BUFFER_SIZE,
+                 max_pending=10000, copy_threshold=1000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.copy_threshold = copy_threshold  # backlogs this large are loaded with COPY
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0  # oldest rows discarded because the database fell behind
+        self.rejected = 0  # rows the database refused, e.g. malformed readings
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+    
+    def add(self, zone, data):
+        """Queue a reading; it is timestamped now rather than at insert time"""
+        row = (
             zone,
+            datetime.utcnow(),
             data.get("batteryVoltage"),
             data.get("inputPower"),
             data.get("outputPower"),
             data.get("solarGeneration"),
             data.get("batteryPercentage"),
             data.get("relayState")
-        ))
+        )
+        with self.lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(row)
+            full = len(self.pending) >= self.batch_size
+            if self.thread is None:
+                # Started lazily so forked workers each get their own flusher
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        if full:
+            self.wakeup.set()
+    
+    def flush(self):
+        """Insert all pending rows in a single statement, or a COPY for a large backlog"""
+        with self.lock:
+            rows = list(self.pending)
+            self.pending.clear()
+        if not rows:
+            return True
         
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return True
+        try:
+            self._insert(rows)
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            # Retrying the same batch would fail forever; split out the rows the database rejects
+            print(f"Error flushing {len(rows)} energy rows, isolating bad rows: {e}")
+            rows = self._insert_valid(rows)
+        except Exception as e:
+            print(f"Error flushing {len(rows)} energy rows: {e}")
+            self._requeue(rows)
+            return False
         
-    except Exception as e:
-        print(f"Error storing energy data: {e}")
-        if conn:
-            conn.rollback()
-            conn.close()
-        return False
+        publish_energy_updates({row[0] for row in rows})
+        return True
+    
+    def _insert(self, rows):
+        """Write rows in one transaction"""
+        with db_conn() as conn, conn.cursor() as cursor:
+            if len(rows) >= self.copy_threshold:
+                store_energy_data_bulk(cursor, rows)
+            else:
+                execute_values(
+                    cursor, f"INSERT INTO energy_data {_ENERGY_COLUMNS} VALUES %s", rows,
+                    page_size=self.batch_size
+                )
+    
+    def _insert_valid(self, rows):
+        """Insert rows by bisecting around the ones the database rejects; returns the rows written"""
+        try:
+            self._insert(rows)
+            return rows
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            if len(rows) == 1:
+                print(f"Dropping rejected energy row for {rows[0][0]}: {e}")
+                with self.lock:
+                    self.rejected += 1
+                return []
+        middle = len(rows) // 2
+        return self._insert_valid(rows[:middle]) + self._insert_valid(rows[middle:])
+    
+    def _requeue(self, rows):
+        """Put a failed batch back ahead of anything queued meanwhile, dropping the oldest on overflow"""
+        with self.lock:
+            overflow = len(rows) + len(self.pending) - self.pending.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                rows = rows[overflow:]
+            self.pending.extendleft(reversed(rows))
+    
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+energy_write_buffer = EnergyWriteBuffer()
+atexit.register(energy_write_buffer.flush)
+
+def queue_energy_data(zone, data):
+    """Queue energy data for the next batched insert"""
+    energy_write_buffer.add(zone, data)
+
+def _history_record(row):
+    """Convert an energy_data row (timestamp first) to an API record; orjson serializes the datetime"""
+    return {
+        "timestamp": row[0],
+        "batteryVoltage": row[1],
+        "inputPower": row[2],
+        "outputPower": row[3],
+        "solarGeneration": row[4],
+        "batteryPercentage": row[5],
+        "relayState": row[6]
+    }
 
 def get_energy_history(zone, hours=24):
     """Get energy history for a zone"""
-    conn = get_db_connection()
-    if not conn:
+    try:
+        # Named (server-side) cursor streams the window in chunks, so only the
+        # records are held in memory rather than the raw rows as well
+        with db_conn() as conn, conn.cursor(name="energy_history") as cursor:
+            cursor.itersize = 2000
+            cursor.execute("""
+                SELECT timestamp, battery_voltage, input_power, output_power, 
+                       solar_generation, battery_percentage, relay_state
+                FROM energy_data 
+                WHERE zone = %s AND timestamp >= %s
+                ORDER BY timestamp DESC
+            """, (zone, datetime.utcnow() - timedelta(hours=hours)))
+            return [_history_record(row) for row in cursor]
+        
+    except Exception as e:
+        print(f"Error getting energy history: {e}")
         return []
+
+def get_energy_history_bulk(zones, hours=24):
+    """Get energy history for several zones in a single query"""
+    history = {zone: [] for zone in zones}
+    try:
+        with db_conn() as conn, conn.cursor(name="energy_history_bulk") as cursor:
+            cursor.itersize = 2000
+            cursor.execute("""
+                SELECT zone, timestamp, battery_voltage, input_power, output_power, 
+                       solar_generation, battery_percentage, relay_state
+                FROM energy_data 
+                WHERE zone = ANY(%s) AND timestamp >= %s
+                ORDER BY zone, timestamp DESC
+            """, (list(history), datetime.utcnow() - timedelta(hours=hours)))
+            for row in cursor:
+                history[row[0]].append(_history_record(row[1:]))
+        return history
         
+    except Exception as e:
+        print(f"Error getting bulk energy history: {e}")
+        return history
+
+def get_energy_history_summary(zones, hours=24):
+    """Get per-zone history statistics, aggregated in PostgreSQL"""
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT timestamp, battery_voltage, input_power, output_power, 
-                   solar_generation, battery_percentage, relay_state
-            FROM energy_data 
-            WHERE zone = %s AND timestamp >= %s
-            ORDER BY timestamp DESC
-        """, (zone, datetime.utcnow() - timedelta(hours=hours)))
+        with db_conn() as conn, conn.cursor() as cursor:
+            # NULLIF keeps zero readings out of the aggregates, matching the row-by-row summary
+            cursor.execute("""
+                SELECT zone, COUNT(*),
+                       AVG(NULLIF(output_power, 0)), MAX(NULLIF(output_power, 0)),
+                       MIN(NULLIF(battery_percentage, 0)), AVG(NULLIF(battery_percentage, 0))
+                FROM energy_data 
+                WHERE zone = ANY(%s) AND timestamp >= %s
+                GROUP BY zone
+            """, (list(zones), datetime.utcnow() - timedelta(hours=hours)))
+            rows = cursor.fetchall()
+        
+        return {row[0]: {
+            "data_points": row[1],
+            "avg_consumption": row[2],
+            "max_consumption": row[3],
+            "min_battery": row[4],
+            "avg_battery": row[5]
+        } for row in rows}
         
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
+    except Exception as e:
+        print(f"Error getting energy history summary: {e}")
+        return {}
+
+def get_daily_zone_summary(hours=24):
+    """Get per-zone consumption and average battery, aggregated in PostgreSQL"""
+    try:
+        with db_conn() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT zone, COALESCE(SUM(output_power), 0), COALESCE(AVG(battery_percentage), 0)
+                FROM energy_data 
+                WHERE timestamp >= %s
+                GROUP BY zone
+            """, (datetime.utcnow() - timedelta(hours=hours),))
+            rows = cursor.fetchall()
         
-        return [{
-            "timestamp": row[0].isoformat(),
-            "batteryVoltage": row[1],
-            "inputPower": row[2],
-            "outputPower": row[3],
-            "solarGeneration": row[4],
-            "batteryPercentage": row[5],
-            "relayState": row[6]
-        } for row in rows]
+        return {row[0]: {
+            "total_consumption": row[1],
+            "avg_battery": row[2]
+        } for row in rows}
         
     except Exception as e:
-        print(f"Error getting energy history: {e}")
-        if conn:
-            conn.close()
-        return []
\ No newline at end of file
+        print(f"Error getting daily zone summary: {e}")
+        return {}
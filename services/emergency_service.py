@@ -3,17 +3,45 @@ Enhanced emergency alert system with escalation procedures
 """
 
 import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import wait
 from datetime import datetime
 from services.notification_service import notification_service
-from services.firebase_service import set_command
+from services.firebase_service import set_command, set_command_async
 from config import Config
 from core.logger import log_emergency
 
 logger = logging.getLogger(__name__)
 
+# Emergency records are kept in memory for a bounded time and count
+EMERGENCY_RETENTION = 7 * 24 * 3600  # seconds
+MAX_EMERGENCIES = 1000
+# How long a shutdown waits for its OFF commands to be acknowledged before reporting them pending
+SHUTDOWN_ACK_TIMEOUT = 5  # seconds
+
+# Zone config is static, so resolve the shutdown groups once
+_DEFERRABLE_ZONES = Config.ZONES_BY_TYPE.get("deferrable", ())
+_NON_CRITICAL_ZONES = Config.ZONES_BY_TYPE.get("non-critical", ()) + _DEFERRABLE_ZONES
+
 class EmergencyService:
     def __init__(self):
-        self.active_emergencies = {}
+        # emergency_id -> data, oldest first, so expiry and time-window reads work from the ends
+        self.active_emergencies = OrderedDict()
+    
+    def _record_emergency(self, emergency_id, emergency_data):
+        """Keep an emergency record, expiring the oldest by age and count"""
+        # Epoch seconds alongside the ISO timestamp, so time windows compare floats
+        now = emergency_data.setdefault("ts_epoch", time.time())
+        self.active_emergencies[emergency_id] = emergency_data
+        self.active_emergencies.move_to_end(emergency_id)
+        
+        while self.active_emergencies:
+            oldest = next(iter(self.active_emergencies.values()))
+            if (len(self.active_emergencies) <= MAX_EMERGENCIES and
+                    now - oldest["ts_epoch"] <= EMERGENCY_RETENTION):
+                break
+            self.active_emergencies.popitem(last=False)
         
     def trigger_emergency_shutdown(self, reason, affected_zones=None):
         """
@@ -22,24 +50,16 @@ class EmergencyService:
         try:
             emergency_id = f"emergency_{int(datetime.utcnow().timestamp())}"
             
-            # Shutdown non-critical zones
-            shutdown_results = {}
-            zones_to_shutdown = affected_zones or []
+            # Shutdown all non-critical zones unless told otherwise
+            zones_to_shutdown = list(affected_zones or _NON_CRITICAL_ZONES)
             
-            if not zones_to_shutdown:
-                # Shutdown all non-critical zones
-                for zone, config in Config.ZONES.items():
-                    if config["type"] in ["non-critical", "deferrable"]:
-                        zones_to_shutdown.append(zone)
-            
-            for zone in zones_to_shutdown:
-                success = set_command(zone, "OFF")
-                shutdown_results[zone] = success
-                
-                if success:
-                    logger.info(f"Emergency shutdown: {zone} turned OFF")
-                else:
-                    logger.error(f"Emergency shutdown failed for {zone}")
+            # Queue every shutdown at once so they go out in one write, then wait briefly for
+            # the acknowledgements; a command still in flight is reported as None (pending)
+            futures = {zone: set_command_async(zone, "OFF") for zone in zones_to_shutdown}
+            for zone, future in futures.items():
+                future.add_done_callback(lambda future, zone=zone: self._log_shutdown(zone, future))
+            wait(futures.values(), timeout=SHUTDOWN_ACK_TIMEOUT)
+            shutdown_results = {zone: self._shutdown_result(future) for zone, future in futures.items()}
             
             # Log emergency
             emergency_data = {
@@ -50,7 +70,7 @@ class EmergencyService:
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            self.active_emergencies[emergency_id] = emergency_data
+            self._record_emergency(emergency_id, emergency_data)
             log_emergency("EMERGENCY_SHUTDOWN", emergency_data)
             
             # Send alerts
@@ -70,6 +90,20 @@ class EmergencyService:
             logger.error(f"Emergency shutdown error: {e}")
             return {"error": str(e)}
     
+    @staticmethod
+    def _shutdown_result(future):
+        """True/False once a queued shutdown command has finished, None while it is pending"""
+        if not future.done():
+            return None
+        return future.exception() is None and bool(future.result())
+    
+    def _log_shutdown(self, zone, future):
+        """Log the outcome of a queued shutdown command, whenever it lands"""
+        if self._shutdown_result(future):
+            logger.info(f"Emergency shutdown: {zone} turned OFF")
+        else:
+            logger.error(f"Emergency shutdown failed for {zone}")
+    
     def handle_critical_zone_failure(self, zone, failure_reason):
         """
         Handle failure of critical zones (hospital, emergency lights)
@@ -96,7 +130,7 @@ class EmergencyService:
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            self.active_emergencies[emergency_id] = emergency_data
+            self._record_emergency(emergency_id, emergency_data)
             log_emergency("CRITICAL_ZONE_FAILURE", emergency_data)
             
             # If restart failed, escalate
@@ -121,8 +155,7 @@ class EmergencyService:
                 # Shutdown all non-critical zones immediately
                 shutdown_result = self.trigger_emergency_shutdown(
                     f"Battery critical: {battery_level:.1f}%",
-                    [zone for zone, config in Config.ZONES.items() 
-                     if config["type"] in ["non-critical", "deferrable"]]
+                    _NON_CRITICAL_ZONES
                 )
                 
                 emergency_data = {
@@ -138,8 +171,7 @@ class EmergencyService:
                 # Shutdown deferrable zones only
                 shutdown_result = self.trigger_emergency_shutdown(
                     f"Battery low: {battery_level:.1f}%",
-                    [zone for zone, config in Config.ZONES.items() 
-                     if config["type"] == "deferrable"]
+                    _DEFERRABLE_ZONES
                 )
                 
                 emergency_data = {
@@ -151,7 +183,7 @@ class EmergencyService:
                     "timestamp": datetime.utcnow().isoformat()
                 }
             
-            self.active_emergencies[emergency_id] = emergency_data
+            self._record_emergency(emergency_id, emergency_data)
             log_emergency("BATTERY_EMERGENCY", emergency_data)
             
             return emergency_data
@@ -220,15 +252,16 @@ class EmergencyService:
     
     def get_emergency_history(self, hours=24):
         """Get emergency history"""
-        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        cutoff_time = time.time() - hours * 3600
         
-        recent_emergencies = {}
-        for eid, data in self.active_emergencies.items():
-            emergency_time = datetime.fromisoformat(data["timestamp"])
-            if emergency_time >= cutoff_time:
-                recent_emergencies[eid] = data
+        # Walk back from the newest record and stop at the first one outside the window
+        recent_ids = []
+        for eid in reversed(self.active_emergencies):
+            if self.active_emergencies[eid]["ts_epoch"] < cutoff_time:
+                break
+            recent_ids.append(eid)
         
-        return recent_emergencies
+        return {eid: self.active_emergencies[eid] for eid in reversed(recent_ids)}
 
 # Global emergency service instance
 emergency_service = EmergencyService()
@@ -4,7 +4,20 @@ Comprehensive Firebase service with generic CRUD, query, and retry logic
 
 import firebase_admin
 from firebase_admin import credentials, db
+from firebase_admin import exceptions as firebase_exceptions
+from flask import g, has_request_context
 from config import Config
+from services.database_service import cache_sensor_data, get_cached_sensor_data, invalidate_sensor_cache
+from cachetools import TTLCache
+from concurrent.futures import Future
+from functools import lru_cache
+import asyncio
+import atexit
+import operator
+import queue
+import random
+import secrets
+import threading
 import time
 import logging
 
@@ -22,11 +35,17 @@ if not firebase_admin._apps:
         logger.error(f"Firebase initialization failed: {e}")
 
 
+@lru_cache(maxsize=512)
+def cached_ref(path):
+    """Reference for a path, built once and reused; references are immutable and thread-safe"""
+    return db.reference(path)
+
+
 # ---------------- Generic Document Functions ----------------
 def get_document(path):
     """Fetch any document from Firebase by path"""
     try:
-        ref = db.reference(path)
+        ref = cached_ref(path)
         return ref.get() or {}
     except Exception as e:
         logger.error(f"Error fetching document {path}: {e}")
@@ -36,22 +55,39 @@ def get_document(path):
 def set_document(path, data):
     """Set any document in Firebase by path"""
     try:
-        ref = db.reference(path)
+        ref = cached_ref(path)
         ref.set({
             **data,
             "lastUpdated": time.time()
         })
+        _invalidate_cached_collection(path)
         return True
     except Exception as e:
         logger.error(f"Error setting document {path}: {e}")
         return False
 
 
+def update_document(path, data):
+    """Update fields of a Firebase document by path; a None value removes the field"""
+    try:
+        ref = cached_ref(path)
+        ref.update({
+            **data,
+            "lastUpdated": time.time()
+        })
+        _invalidate_cached_collection(path)
+        return True
+    except Exception as e:
+        logger.error(f"Error updating document {path}: {e}")
+        return False
+
+
 def add_document(path, data):
     """Add a new document to a Firebase collection with auto-generated key"""
     try:
-        ref = db.reference(path)
+        ref = cached_ref(path)
         new_ref = ref.push(data)
+        _invalidate_cached_collection(path)
         logger.info(f"Document added to {path} with key {new_ref.key}")
         return new_ref.key
     except Exception as e:
@@ -59,35 +95,429 @@ def add_document(path, data):
         return None
 
 
+# ---------------- Cached Collections ----------------
+# Short-lived copies of small, read-heavy collections such as "zones" and of
+# the dashboard queries over history and predictions. Local writes evict
+# immediately; writes made by other processes show up once the TTL expires.
+_collection_cache = TTLCache(maxsize=64, ttl=5)
+_collection_cache_lock = threading.Lock()
+
+
+def _invalidate_cached_collection(path):
+    """Evict the cached collection and queries a written path belongs to"""
+    collection = path.strip("/").split("/", 1)[0]
+    with _collection_cache_lock:
+        for key in [k for k in _collection_cache if k[0] == collection]:
+            _collection_cache.pop(key, None)
+
+
+def get_cached_collection(collection):
+    """Fetch a top-level collection, reusing the result for a few seconds"""
+    with _collection_cache_lock:
+        data = _collection_cache.get((collection,))
+    if data is not None:
+        return data
+    
+    data = get_collection(collection)
+    if data:
+        with _collection_cache_lock:
+            _collection_cache[(collection,)] = data
+    return data
+
+
+def get_cached_query(path, filters=None, **kwargs):
+    """query_collection, reusing the result for a few seconds"""
+    key = (path.strip("/"), tuple(filters or ()), tuple(sorted(kwargs.items())))
+    with _collection_cache_lock:
+        data = _collection_cache.get(key)
+    if data is not None:
+        return data
+    
+    data = query_collection(path, filters=filters, **kwargs)
+    if data:
+        with _collection_cache_lock:
+            _collection_cache[key] = data
+    return data
+
+
+# Firebase push ID alphabet, in ASCII order so keys sort the same way as their timestamps
+_PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_push_id_lock = threading.Lock()
+_last_push_time = 0
+_last_random_chars = []
+
+
+def generate_push_id():
+    """
+    Generate a chronologically ordered key in Firebase's push ID format
+    without a round-trip, so several new documents can be written in one update
+    """
+    global _last_push_time, _last_random_chars
+    
+    with _push_id_lock:
+        now = int(time.time() * 1000)
+        if now == _last_push_time:
+            # Same millisecond: increment the random part so keys stay ordered
+            for i in range(11, -1, -1):
+                if _last_random_chars[i] < 63:
+                    _last_random_chars[i] += 1
+                    break
+                _last_random_chars[i] = 0
+        else:
+            _last_push_time = now
+            _last_random_chars = [secrets.randbelow(64) for _ in range(12)]
+        random_chars = list(_last_random_chars)
+    
+    time_chars = []
+    for _ in range(8):
+        now, remainder = divmod(now, 64)
+        time_chars.append(_PUSH_CHARS[remainder])
+    return "".join(reversed(time_chars)) + "".join(_PUSH_CHARS[i] for i in random_chars)
+
+
+def add_documents_batch(path, documents, batch_size=500):
+    """
+    Add several documents to a Firebase collection with auto-generated keys,
+    one multi-path update per batch instead of one push per document
+    :return: list of new keys, or None if a batch failed
+    """
+    keys = []
+    try:
+        ref = cached_ref(path)
+        for start in range(0, len(documents), batch_size):
+            batch = {generate_push_id(): document for document in documents[start:start + batch_size]}
+            ref.update(batch)
+            keys.extend(batch)
+        _invalidate_cached_collection(path)
+        logger.info(f"{len(keys)} documents added to {path}")
+        return keys
+    except Exception as e:
+        logger.error(f"Error adding documents to {path}: {e}")
+        return None
+
+
 def get_collection(path):
     """Fetch all documents from a Firebase collection"""
     try:
-        ref = db.reference(path)
+        ref = cached_ref(path)
         return ref.get() or {}
     except Exception as e:
         logger.error(f"Error fetching collection {path}: {e}")
         return {}
 
 
-def query_collection(path, filter_func=None):
+_FILTER_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge
+}
+
+
+def _matches_filters(document, filters):
+    """Check a document against (field, op, value) conditions"""
+    if not isinstance(document, dict):
+        return False
+    try:
+        return all(
+            _FILTER_OPERATORS[op](document.get(field), value)
+            for field, op, value in filters
+        )
+    except TypeError:
+        # Missing or mistyped field can't satisfy an ordering comparison
+        return False
+
+
+def query_collection(path, filter_func=None, filters=None, order_by=None, limit=None, end_before=None,
+                     descending=False, fields=None):
     """
-    Fetch all documents from a Firebase path and optionally filter them.
+    Fetch documents from a Firebase path, optionally ordered, limited and filtered.
     :param filter_func: function to filter documents, receives (key, value)
+    :param filters: list of (field, op, value) conditions; with a limit, one "==" condition is
+                    sent to the server (needs an .indexOn rule) and the rest apply to its matches
+    :param order_by: child key to order by on the server; needs an .indexOn rule (database.rules.json)
+    :param limit: only fetch the last `limit` documents in that order
+    :param end_before: key cursor - only fetch documents whose key sorts before it (key order only)
+    :param descending: return documents last-first, e.g. newest first when ordering by timestamp
+    :param fields: only keep these child keys of each document; the Realtime Database has no
+                   projection, so this trims what callers serialize, not what is downloaded
     """
     try:
-        data = get_collection(path)
+        server_filter = None
+        if filters and limit is not None:
+            # limit_to_last would trim before the filters run, so the equality
+            # filter goes to the server and ordering and limit are applied here
+            server_filter = next((f for f in filters if f[1] == "=="), None)
+            if server_filter is None or end_before is not None:
+                raise ValueError("filters with a limit need an == condition and no cursor")
+        
+        if server_filter is not None:
+            field, _, value = server_filter
+            data = cached_ref(path).order_by_child(field).equal_to(value).get() or {}
+            matches = [(k, v) for k, v in data.items() if _matches_filters(v, filters)]
+            if order_by:
+                matches.sort(key=lambda item: (item[1].get(order_by) is not None, item[1].get(order_by), item[0]))
+            else:
+                matches.sort(key=lambda item: item[0])
+            data = dict(matches[-limit:] if limit else [])
+        elif order_by is None and limit is None and end_before is None:
+            data = get_collection(path)
+        else:
+            if order_by is not None and end_before is not None:
+                raise ValueError("end_before cursor requires key order")
+            
+            query = cached_ref(path)
+            query = query.order_by_child(order_by) if order_by else query.order_by_key()
+            if end_before is not None:
+                # end_at is inclusive, so fetch one extra and drop the cursor itself
+                query = query.end_at(end_before)
+            if limit is not None:
+                query = query.limit_to_last(limit + (end_before is not None))
+            
+            data = query.get() or {}
+            if end_before is not None:
+                data.pop(end_before, None)
+                if limit is not None and len(data) > limit:
+                    data = dict(list(data.items())[-limit:])
+        
+        if filters:
+            data = {k: v for k, v in data.items() if _matches_filters(v, filters)}
         if filter_func:
             data = {k: v for k, v in data.items() if filter_func(k, v)}
+        if fields:
+            data = {
+                k: {field: v[field] for field in fields if field in v} if isinstance(v, dict) else v
+                for k, v in data.items()
+            }
+        if descending:
+            # The server only returns ascending order; limit_to_last already
+            # picked the newest documents, so flipping them is all that's left
+            data = dict(reversed(list(data.items())))
         return data
     except Exception as e:
         logger.error(f"Error querying collection {path}: {e}")
         return {}
 
 
+# ---------------- Buffered Writes ----------------
+class WriteBuffer:
+    """
+    Coalesce small field writes into one multi-path Firebase update.
+    Pending writes are keyed by path, so a burst of updates to the same
+    field only sends the latest value.
+    """
+    
+    def __init__(self, flush_interval=0.2, max_pending=32):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = {}
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+    
+    def write(self, path, value):
+        """Queue a value to be written at path on the next flush"""
+        with self.lock:
+            self.pending[path] = value
+            full = len(self.pending) >= self.max_pending
+            if self.thread is None:
+                # Started lazily so forked workers each get their own flusher
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        if full:
+            self.wakeup.set()
+    
+    def flush(self):
+        """Send all pending writes as a single multi-path update"""
+        with self.lock:
+            updates, self.pending = self.pending, {}
+        if not updates:
+            return True
+        
+        try:
+            for path in self._update_valid(updates):
+                _invalidate_cached_collection(path)
+            return True
+        except Exception as e:
+            logger.error(f"Error flushing {len(updates)} buffered writes: {e}")
+            with self.lock:
+                # Keep any newer value written while we were flushing
+                for path, value in updates.items():
+                    self.pending.setdefault(path, value)
+            return False
+    
+    def _update_valid(self, updates):
+        """Send updates by bisecting around the paths Firebase rejects; returns the paths written"""
+        try:
+            cached_ref("/").update(updates)
+            return list(updates)
+        except (ValueError, TypeError, firebase_exceptions.InvalidArgumentError) as e:
+            if len(updates) == 1:
+                logger.error(f"Dropping rejected buffered write to {next(iter(updates))}: {e}")
+                with self.lock:
+                    self.rejected += 1
+                return []
+        items = list(updates.items())
+        middle = len(items) // 2
+        return self._update_valid(dict(items[:middle])) + self._update_valid(dict(items[middle:]))
+    
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+
+write_buffer = WriteBuffer()
+atexit.register(write_buffer.flush)
+
+
 # ---------------- Sensor & Command Functions ----------------
+# In-process copy of the sensor snapshot, in front of the shared Redis cache.
+# Keyed on a version that set_command bumps, so a command makes the old entry unreachable.
+_sensor_cache = TTLCache(maxsize=1, ttl=Config.SENSOR_CACHE_TTL)
+_sensor_cache_lock = threading.Lock()
+_sensor_version = 0
+
+
+# Live copy of sensors/ kept current by a Firebase listener, once started.
+# Each change swaps in a new dict, so readers never see one mid-update.
+_live_sensors = None
+_live_sensors_changes = 0
+_live_sensors_at = 0  # time.time() of the last listener event
+_live_sensors_lock = threading.Lock()
+_sensor_listener = None
+
+
+def _with_path(tree, parts, value):
+    """Copy of tree with value set at the given path (None deletes), copying only along the path"""
+    if not parts:
+        return value
+    tree = dict(tree) if isinstance(tree, dict) else {}
+    child = _with_path(tree.get(parts[0]), parts[1:], value)
+    if child is None:
+        tree.pop(parts[0], None)
+    else:
+        tree[parts[0]] = child
+    # Firebase has no empty nodes
+    return tree or None
+
+
+def _apply_sensor_event(event):
+    """Fold a put/patch event from the sensors listener into the live copy"""
+    global _live_sensors, _live_sensors_changes, _live_sensors_at
+    
+    parts = [part for part in event.path.split("/") if part]
+    with _live_sensors_lock:
+        sensors = _live_sensors or {}
+        if event.event_type == "put":
+            sensors = _with_path(sensors, parts, event.data)
+        else:
+            for key, value in (event.data or {}).items():
+                sensors = _with_path(sensors, parts + [part for part in key.split("/") if part], value)
+        _live_sensors = sensors or {}
+        _live_sensors_changes += 1
+        _live_sensors_at = time.time()
+
+
+def start_sensor_listener():
+    """Keep sensor data pushed into memory instead of polling Firebase for it"""
+    global _sensor_listener
+    if _sensor_listener is not None:
+        return True
+    try:
+        _sensor_listener = cached_ref("sensors").listen(_apply_sensor_event)
+        logger.info("Sensor listener started")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not start sensor listener, polling instead: {e}")
+        return False
+
+
+def stop_sensor_listener():
+    """
+    Close the sensor listener; its stream runs on a non-daemon thread, so a
+    process that started it must call this before exiting
+    """
+    global _sensor_listener, _live_sensors
+    listener = _sensor_listener
+    if listener is None:
+        return
+    _sensor_listener = None
+    with _live_sensors_lock:
+        _live_sensors = None
+    try:
+        listener.close()
+        logger.info("Sensor listener stopped")
+    except Exception as e:
+        logger.warning(f"Error closing sensor listener: {e}")
+
+
+def _fresh_live_sensors():
+    """The pushed sensor copy, or None if there is none or the stream has gone quiet"""
+    if _live_sensors is None or time.time() - _live_sensors_at > Config.SENSOR_STREAM_MAX_AGE:
+        return None
+    return _live_sensors
+
+
+def get_sensor_data_changes():
+    """Count of pushed sensor changes, or None when no fresh listener copy is available"""
+    return _live_sensors_changes if _fresh_live_sensors() is not None else None
+
+
 def get_sensor_data():
-    """Fetch latest sensor data from Firebase"""
-    return get_document("sensors/")
+    """Fetch latest sensor data, served from memory or Redis for a couple of seconds"""
+    live_sensors = _fresh_live_sensors()
+    if live_sensors is not None:
+        return live_sensors
+    
+    version = _sensor_version
+    with _sensor_cache_lock:
+        cached = _sensor_cache.get(version)
+    if cached is not None:
+        return cached
+    
+    data = get_cached_sensor_data()
+    if data is None:
+        data = get_document("sensors/")
+        if data:
+            cache_sensor_data(data)
+    
+    if data:
+        with _sensor_cache_lock:
+            _sensor_cache[version] = data
+    return data
+
+
+def invalidate_sensor_data():
+    """Drop cached sensor snapshots after a state change"""
+    global _sensor_version
+    with _sensor_cache_lock:
+        _sensor_version += 1
+        _sensor_cache.clear()
+    invalidate_sensor_cache()
+
+
+def get_request_sensor_data():
+    """Fetch sensor data once per request and reuse it for the rest of the request"""
+    if not has_request_context():
+        return get_sensor_data()
+    if "sensor_data" not in g:
+        g.sensor_data = get_sensor_data()
+    return g.sensor_data
+
+
+async def get_sensor_data_async():
+    """Fetch request-scoped sensor data without blocking the event loop"""
+    return await asyncio.to_thread(get_request_sensor_data)
+
+
+def _retry_delay(attempt, base=0.05, cap=1.0):
+    """Exponential backoff (0.05s, 0.2s, 0.8s, ...) with +/-20% jitter so retries don't line up"""
+    return min(base * 4 ** attempt, cap) * random.uniform(0.8, 1.2)
 
 
 def set_command(zone, command, retry_count=3):
@@ -96,21 +526,118 @@ def set_command(zone, command, retry_count=3):
     """
     for attempt in range(retry_count):
         try:
-            path = f"commands/{zone}"
-            set_document(path, {
+            # Written directly rather than through set_document, which swallows errors
+            cached_ref(f"commands/{zone}").set({
                 "command": command,
-                "attempt": attempt + 1
+                "attempt": attempt + 1,
+                "lastUpdated": time.time()
             })
             logger.info(f"Command sent successfully: {zone} -> {command}")
+            invalidate_sensor_data()
             return True
         except Exception as e:
-            logger.warning(f"Command attempt {attempt + 1} failed: {e}")
+            logger.warning(f"Command attempt {attempt + 1} failed for {zone}: {e}")
             if attempt < retry_count - 1:
-                time.sleep(1)
+                time.sleep(_retry_delay(attempt))
     logger.error(f"Failed to send command after {retry_count} attempts")
     return False
 
 
+def set_commands(commands, retry_count=3):
+    """
+    Send ON/OFF commands to several zones in one multi-path Firebase update
+    :param commands: dict of zone -> command
+    :return: dict of zone -> success
+    """
+    if not commands:
+        return {}
+    
+    for attempt in range(retry_count):
+        try:
+            timestamp = time.time()
+            cached_ref("/").update({
+                f"commands/{zone}": {
+                    "command": command,
+                    "attempt": attempt + 1,
+                    "lastUpdated": timestamp
+                }
+                for zone, command in commands.items()
+            })
+            logger.info(f"Commands sent successfully: {commands}")
+            invalidate_sensor_data()
+            return {zone: True for zone in commands}
+        except Exception as e:
+            logger.warning(f"Batch command attempt {attempt + 1} failed: {e}")
+            if attempt < retry_count - 1:
+                time.sleep(_retry_delay(attempt))
+    logger.error(f"Failed to send batch commands after {retry_count} attempts")
+    return {zone: False for zone in commands}
+
+
+class CommandQueue:
+    """
+    Send zone commands from a background thread so callers don't wait on the
+    Firebase round-trip. Everything queued by the time the sender wakes goes
+    out in one multi-path update; failed writes are retried with exponential backoff.
+    """
+    
+    def __init__(self, retry_count=3, max_pending=1024, max_batch=64):
+        self.retry_count = retry_count
+        self.max_batch = max_batch
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.thread = None
+    
+    def submit(self, zone, command):
+        """Queue a command; the returned Future resolves to True once Firebase has it"""
+        future = Future()
+        with self.lock:
+            if self.thread is None:
+                # Started lazily so forked workers each get their own sender
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        try:
+            self.pending.put_nowait((zone, command, future))
+        except queue.Full:
+            logger.error(f"Command queue full, dropping {zone} -> {command}")
+            future.set_result(False)
+        return future
+    
+    def _send(self, commands):
+        """Write zone -> command in one update; the batch succeeds or fails as a whole"""
+        return all(set_commands(commands, self.retry_count).values())
+    
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # Queue order is kept, so a later command for the same zone wins
+            commands = {zone: command for zone, command, _ in batch}
+            try:
+                success = self._send(commands)
+                for _, _, future in batch:
+                    future.set_result(success)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+
+
+command_queue = CommandQueue()
+
+
+def set_command_async(zone, command):
+    """
+    Queue a command (ON/OFF) for a zone without waiting for Firebase
+    :return: Future resolving to whether the command was written
+    """
+    return command_queue.submit(zone, command)
+
+
 def get_zone_status(zone):
     """Get current status of a specific zone"""
     return get_document(f"status/{zone}")
@@ -122,14 +649,18 @@ def set_zone_status(zone, status):
 
 
 def get_all_zone_commands():
-    """Get all pending commands"""
-    return get_document("commands/")
+    """Get all pending commands, keeping only well-formed command records"""
+    return {
+        zone: command_data
+        for zone, command_data in get_document("commands/").items()
+        if isinstance(command_data, dict)
+    }
 
 
 def clear_command(zone):
     """Clear executed command"""
     try:
-        ref = db.reference(f"commands/{zone}")
+        ref = cached_ref(f"commands/{zone}")
         ref.delete()
         return True
     except Exception as e:
@@ -4,24 +4,125 @@ Includes battery prediction, demand forecasting, and anomaly detection
 """
 
 import numpy as np
-import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta
-import pickle
+from functools import lru_cache
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+MODELS_DIR = "models"
+# All model state is stored as plain arrays, loaded without pickle
+MODEL_ARRAYS_PATH = f"{MODELS_DIR}/models.npz"
+
+# Near-zero ridge penalty: plain least squares, solved through the tiny Gram matrix
+# rather than an SVD, and still solvable when features are collinear
+RIDGE_ALPHA = 1e-6
+
+# Training readings outside these quantiles count as anomalous
+ANOMALY_QUANTILES = (0.01, 0.99)
+
+# Rule-based anomaly messages, indexed by bit in the rule mask
+_RULE_ANOMALY_MESSAGES = (
+    "Battery voltage out of range",
+    "Output power significantly exceeds input",
+    "Negative power values detected"
+)
+_ML_ANOMALY_MESSAGE = "ML model detected anomaly"
+# Shared result for clean readings; only handed out through a copy
+_CLEAN_ANOMALY_RESULT = {"hasAnomaly": False, "anomalies": [], "severity": "LOW"}
+
+def _new_linear_model():
+    """Unfitted linear regressor used for the battery and demand models"""
+    from sklearn.linear_model import Ridge
+    return Ridge(alpha=RIDGE_ALPHA, solver="cholesky")
+
+def _linear_arrays(name, model):
+    """Fitted state of a linear model as named arrays (empty if unfitted)"""
+    if not hasattr(model, "coef_"):
+        return {}
+    return {f"{name}_coef": model.coef_, f"{name}_intercept": np.asarray(model.intercept_)}
+
+def _restore_linear(arrays, name):
+    """Rebuild a linear model from the arrays written by _linear_arrays"""
+    model = _new_linear_model()
+    if f"{name}_coef" in arrays:
+        model.coef_ = arrays[f"{name}_coef"]
+        model.intercept_ = arrays[f"{name}_intercept"][()]
+        model.n_features_in_ = model.coef_.shape[-1]
+    return model
+
+def _anomaly_arrays(bounds):
+    """Anomaly envelope as named arrays (empty if not trained)"""
+    if bounds is None:
+        return {}
+    return {"anomaly_low": bounds[0], "anomaly_high": bounds[1]}
+
+def _restore_anomaly_bounds(arrays):
+    """Anomaly envelope written by _anomaly_arrays, or None"""
+    if "anomaly_low" not in arrays:
+        return None
+    return arrays["anomaly_low"], arrays["anomaly_high"]
+
 class EnergyMLService:
     def __init__(self):
-        self.battery_model = LinearRegression()
-        self.demand_model = LinearRegression()
-        self.anomaly_detector = IsolationForest(contamination=0.1)
-        self.scaler = StandardScaler()
+        # Estimators are created on first training or load, so sklearn is
+        # only imported by processes that actually use the models
+        self.battery_model = None
+        self.demand_model = None
+        # (low, high) per-feature envelope of normal input/output power and voltage
+        self.anomaly_bounds = None
         self.models_trained = False
+        # Bumped whenever the models change, so callers can key their own caches on it
+        self.model_version = 0
+        
+        # Plain coefficient copies of the linear models for the hot predict paths
+        self._battery_coef = self._battery_intercept = None
+        self._demand_coef = self._demand_intercept = None
+        
+        # Dashboards poll the same readings repeatedly, so memoize per rounded input
+        self._sustain_cache = lru_cache(maxsize=1024)(self._predict_battery_sustain)
+        self._anomaly_cache = lru_cache(maxsize=1024)(self._detect_anomaly)
+        # Schedules only ever ask about 24 hours x 7 weekdays of solar buckets
+        self._demand_cache = lru_cache(maxsize=512)(self._predict_demand)
+    
+    @staticmethod
+    def _linear_coefficients(model):
+        """(coef, intercept) of a fitted linear model, or (None, None)"""
+        if not hasattr(model, "coef_"):
+            return None, None
+        return np.asarray(model.coef_, dtype=np.float64).ravel(), float(model.intercept_)
+    
+    def _cache_coefficients(self):
+        """Copy linear model weights out of sklearn after fitting or loading"""
+        self._battery_coef, self._battery_intercept = self._linear_coefficients(self.battery_model)
+        self._demand_coef, self._demand_intercept = self._linear_coefficients(self.demand_model)
+    
+    def _outside_anomaly_bounds(self, features):
+        """Row mask of (n, 3) features falling outside the learned envelope"""
+        if self.anomaly_bounds is None:
+            return np.zeros(len(features), dtype=bool)
+        low, high = self.anomaly_bounds
+        return ((features < low) | (features > high)).any(axis=1)
+    
+    def _ensure_estimators(self):
+        """Create any estimators that don't exist yet"""
+        if self.battery_model is None:
+            self.battery_model = _new_linear_model()
+        if self.demand_model is None:
+            self.demand_model = _new_linear_model()
+    
+    def _clear_prediction_caches(self):
+        """Drop memoized predictions after the models change"""
+        self.model_version += 1
+        self._sustain_cache.cache_clear()
+        self._anomaly_cache.cache_clear()
+        self._demand_cache.cache_clear()
+    
+    @staticmethod
+    def _feature_key(*values):
+        """Round readings so near-identical samples share a cache entry"""
+        return tuple(round(float(value), 2) for value in values)
         
     def train_models(self, historical_data):
         """Train ML models with historical data"""
@@ -29,36 +130,43 @@ class EnergyMLService:
             if not historical_data:
                 logger.warning("No historical data available for training")
                 return False
-                
+            
+            import pandas as pd
+            self._ensure_estimators()
             df = pd.DataFrame(historical_data)
+            columns = set(df.columns)
             
             # Prepare features for battery prediction
             battery_features = ['input_power', 'output_power', 'solar_generation']
-            if all(col in df.columns for col in battery_features):
-                X_battery = df[battery_features].fillna(0)
+            if columns.issuperset(battery_features):
+                X_battery = df[battery_features].to_numpy(dtype=np.float32, na_value=0.0)
                 y_battery = df['battery_percentage'].fillna(50)
                 
                 self.battery_model.fit(X_battery, y_battery)
                 
-            # Prepare features for demand forecasting
-            df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-            df['day_of_week'] = pd.to_datetime(df['timestamp']).dt.dayofweek
+            # Prepare features for demand forecasting; parse timestamps only once
+            timestamps = pd.to_datetime(df['timestamp'], utc=True, cache=True)
+            df['hour'] = timestamps.dt.hour
+            df['day_of_week'] = timestamps.dt.dayofweek
+            columns.update(('hour', 'day_of_week'))
             
             demand_features = ['hour', 'day_of_week', 'solar_generation']
-            if all(col in df.columns for col in demand_features):
-                X_demand = df[demand_features].fillna(0)
+            if columns.issuperset(demand_features):
+                X_demand = df[demand_features].to_numpy(dtype=np.float32, na_value=0.0)
                 y_demand = df['output_power'].fillna(0)
                 
                 self.demand_model.fit(X_demand, y_demand)
                 
             # Train anomaly detector
             anomaly_features = ['input_power', 'output_power', 'battery_voltage']
-            if all(col in df.columns for col in anomaly_features):
-                X_anomaly = df[anomaly_features].fillna(0)
-                X_anomaly_scaled = self.scaler.fit_transform(X_anomaly)
-                self.anomaly_detector.fit(X_anomaly_scaled)
+            if columns.issuperset(anomaly_features):
+                X_anomaly = df[anomaly_features].to_numpy(dtype=np.float64, na_value=0.0)
+                # Three features of unimodal power data: a quantile box is enough
+                self.anomaly_bounds = tuple(np.quantile(X_anomaly, ANOMALY_QUANTILES, axis=0))
                 
             self.models_trained = True
+            self._cache_coefficients()
+            self._clear_prediction_caches()
             self._save_models()
             logger.info("ML models trained successfully")
             return True
@@ -72,11 +180,20 @@ class EnergyMLService:
         Predict battery sustain time using multiple factors
         """
         try:
-            battery_voltage = current_data.get("batteryVoltage", 12)
-            input_power = current_data.get("inputPower", 0)
-            output_power = current_data.get("outputPower", 0)
-            solar_generation = current_data.get("solarGeneration", 0)
-            
+            key = self._feature_key(
+                current_data.get("batteryVoltage", 12),
+                current_data.get("inputPower", 0),
+                current_data.get("outputPower", 0),
+                current_data.get("solarGeneration", 0)
+            )
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error predicting battery sustain: {e}")
+            return 0
+        return self._sustain_cache(*key)
+    
+    def _predict_battery_sustain(self, battery_voltage, input_power, output_power, solar_generation):
+        """Uncached battery sustain prediction"""
+        try:
             # Simple physics-based calculation as fallback
             if output_power <= 0:
                 return float("inf")
@@ -91,10 +208,14 @@ class EnergyMLService:
             hours = (battery_capacity_wh * 0.8) / net_consumption  # 80% usable capacity
             
             # Use ML model if trained
-            if self.models_trained:
+            if self.models_trained and self._battery_coef is not None:
                 try:
-                    features = np.array([[input_power, output_power, solar_generation]])
-                    ml_prediction = self.battery_model.predict(features)[0]
+                    # Three multiply-adds instead of a full sklearn predict call
+                    coef = self._battery_coef
+                    ml_prediction = (
+                        coef[0] * input_power + coef[1] * output_power
+                        + coef[2] * solar_generation + self._battery_intercept
+                    )
                     # Combine physics and ML prediction
                     hours = (hours + ml_prediction) / 2
                 except Exception as e:
@@ -106,62 +227,167 @@ class EnergyMLService:
             logger.error(f"Error predicting battery sustain: {e}")
             return 0
     
+    def predict_battery_sustain_batch(self, zone_data_list):
+        """
+        Predict battery sustain time for several zones with one model call
+        :return: list of sustain hours, in the same order as zone_data_list
+        """
+        try:
+            features = np.array([[
+                data.get("batteryVoltage", 12),
+                data.get("inputPower", 0),
+                data.get("outputPower", 0),
+                data.get("solarGeneration", 0)
+            ] for data in zone_data_list], dtype=float).reshape(-1, 4)
+        except (TypeError, ValueError):
+            # Malformed readings - let the single-zone path handle each one
+            return [self.predict_battery_sustain(data) for data in zone_data_list]
+        
+        battery_voltage, input_power, output_power, solar_generation = features.T
+        
+        # Same physics model as the single-zone path, over all zones at once
+        battery_capacity_wh = (battery_voltage - 10.5) / (12.6 - 10.5) * 100
+        net_consumption = output_power - input_power - solar_generation
+        stable = (output_power <= 0) | (net_consumption <= 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            hours = (battery_capacity_wh * 0.8) / net_consumption
+        
+        if self.models_trained and self._battery_coef is not None and len(features):
+            try:
+                hours = (hours + features[:, 1:] @ self._battery_coef + self._battery_intercept) / 2
+            except Exception as e:
+                logger.warning(f"ML prediction failed, using physics model: {e}")
+        
+        hours = np.where(stable, np.inf, np.maximum(0, np.round(hours, 2)))
+        return hours.tolist()
+    
     def predict_demand(self, hour, day_of_week, solar_forecast):
         """Predict energy demand for given time"""
         try:
-            if not self.models_trained:
+            key = (int(hour), int(day_of_week), round(float(solar_forecast), 1))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error predicting demand: {e}")
+            return 40  # Default demand
+        return self._demand_cache(*key)
+    
+    def _predict_demand(self, hour, day_of_week, solar_forecast):
+        """Uncached demand prediction"""
+        return self.predict_demand_batch([[hour, day_of_week, solar_forecast]])[0]
+    
+    def predict_demand_batch(self, features):
+        """
+        Predict energy demand for many time slots in one call
+        :param features: rows of (hour, day_of_week, solar_forecast)
+        :return: list of predicted demands, one per row
+        """
+        features = np.asarray(features, dtype=float).reshape(-1, 3)
+        try:
+            if not self.models_trained or self._demand_coef is None:
                 # Simple heuristic based on time of day
-                if 6 <= hour <= 18:  # Daytime
-                    return 50 + (solar_forecast * 0.3)
-                else:  # Nighttime
-                    return 30
+                hours, solar = features[:, 0], features[:, 2]
+                daytime = (hours >= 6) & (hours <= 18)
+                return np.where(daytime, 50 + solar * 0.3, 30).tolist()
                     
-            features = np.array([[hour, day_of_week, solar_forecast]])
-            prediction = self.demand_model.predict(features)[0]
-            return max(0, prediction)
+            predictions = features @ self._demand_coef + self._demand_intercept
+            return np.maximum(predictions, 0).tolist()
             
         except Exception as e:
             logger.error(f"Error predicting demand: {e}")
-            return 40  # Default demand
+            return [40] * len(features)  # Default demand
     
     def detect_anomaly(self, current_data):
         """Detect anomalies in energy data"""
         try:
-            input_power = current_data.get("inputPower", 0)
-            output_power = current_data.get("outputPower", 0)
-            battery_voltage = current_data.get("batteryVoltage", 12)
-            
+            key = self._feature_key(
+                current_data.get("inputPower", 0),
+                current_data.get("outputPower", 0),
+                current_data.get("batteryVoltage", 12)
+            )
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error detecting anomaly: {e}")
+            return {"hasAnomaly": False, "anomalies": [], "severity": "LOW"}
+        
+        result = self._anomaly_cache(*key)
+        # Hand out a copy so callers can't mutate the cached entry
+        return {**result, "anomalies": list(result["anomalies"])}
+    
+    def detect_anomaly_batch(self, zone_data_list):
+        """
+        Detect anomalies for several zones, scoring them with one model call
+        :return: list of anomaly results, in the same order as zone_data_list
+        """
+        try:
+            features = np.array([[
+                data.get("inputPower", 0),
+                data.get("outputPower", 0),
+                data.get("batteryVoltage", 12)
+            ] for data in zone_data_list], dtype=float).reshape(-1, 3)
+        except (TypeError, ValueError):
+            return [self.detect_anomaly(data) for data in zone_data_list]
+        
+        ml_flags = self._outside_anomaly_bounds(features)
+        
+        # Rule checks for every zone at once; clean zones skip building a findings list
+        masks = self._rule_anomaly_mask(*features.T)
+        results = []
+        for mask, ml_flag in zip(masks.tolist(), ml_flags.tolist()):
+            if not mask and not ml_flag:
+                results.append({**_CLEAN_ANOMALY_RESULT, "anomalies": []})
+                continue
+            anomalies = self._rule_anomalies(mask)
+            if ml_flag:
+                anomalies.append(_ML_ANOMALY_MESSAGE)
+            results.append(self._anomaly_result(anomalies))
+        return results
+    
+    @staticmethod
+    def _rule_anomaly_mask(input_power, output_power, battery_voltage):
+        """Rule-based anomaly checks as a bitmask (works on scalars and arrays)"""
+        # Check for impossible values
+        return (
+            ((battery_voltage < 9) | (battery_voltage > 15)) * 1
+            | (output_power > input_power * 2) * 2
+            | ((input_power < 0) | (output_power < 0)) * 4
+        )
+    
+    @staticmethod
+    def _rule_anomalies(mask):
+        """Messages for the rule checks set in mask"""
+        return [message for bit, message in enumerate(_RULE_ANOMALY_MESSAGES) if mask & (1 << bit)]
+    
+    @staticmethod
+    def _anomaly_result(anomalies):
+        """Build the anomaly response from a list of findings"""
+        return {
+            "hasAnomaly": len(anomalies) > 0,
+            "anomalies": anomalies,
+            "severity": "HIGH" if len(anomalies) > 1 else "MEDIUM" if anomalies else "LOW"
+        }
+    
+    def _detect_anomaly(self, input_power, output_power, battery_voltage):
+        """Uncached anomaly detection"""
+        try:
             # Rule-based anomaly detection
-            anomalies = []
-            
-            # Check for impossible values
-            if battery_voltage < 9 or battery_voltage > 15:
-                anomalies.append("Battery voltage out of range")
-                
-            if output_power > input_power * 2:
-                anomalies.append("Output power significantly exceeds input")
-                
-            if input_power < 0 or output_power < 0:
-                anomalies.append("Negative power values detected")
+            mask = self._rule_anomaly_mask(input_power, output_power, battery_voltage)
+            is_anomaly = False
                 
             # ML-based anomaly detection if trained
-            if self.models_trained:
-                try:
-                    features = np.array([[input_power, output_power, battery_voltage]])
-                    features_scaled = self.scaler.transform(features)
-                    is_anomaly = self.anomaly_detector.predict(features_scaled)[0] == -1
-                    
-                    if is_anomaly:
-                        anomalies.append("ML model detected anomaly")
-                        
-                except Exception as e:
-                    logger.warning(f"ML anomaly detection failed: {e}")
+            if self.anomaly_bounds is not None:
+                low, high = self.anomaly_bounds
+                features = (input_power, output_power, battery_voltage)
+                is_anomaly = any(
+                    value < low_value or value > high_value
+                    for value, low_value, high_value in zip(features, low, high)
+                )
             
-            return {
-                "hasAnomaly": len(anomalies) > 0,
-                "anomalies": anomalies,
-                "severity": "HIGH" if len(anomalies) > 1 else "MEDIUM" if anomalies else "LOW"
-            }
+            if not mask and not is_anomaly:
+                # Cached result; detect_anomaly copies it before handing it out
+                return _CLEAN_ANOMALY_RESULT
+            
+            anomalies = self._rule_anomalies(mask)
+            if is_anomaly:
+                anomalies.append(_ML_ANOMALY_MESSAGE)
+            return self._anomaly_result(anomalies)
             
         except Exception as e:
             logger.error(f"Error detecting anomaly: {e}")
@@ -170,20 +396,13 @@ class EnergyMLService:
     def _save_models(self):
         """Save trained models to disk"""
         try:
-            models_dir = "models"
-            os.makedirs(models_dir, exist_ok=True)
-            
-            with open(f"{models_dir}/battery_model.pkl", "wb") as f:
-                pickle.dump(self.battery_model, f)
-                
-            with open(f"{models_dir}/demand_model.pkl", "wb") as f:
-                pickle.dump(self.demand_model, f)
-                
-            with open(f"{models_dir}/anomaly_detector.pkl", "wb") as f:
-                pickle.dump(self.anomaly_detector, f)
-                
-            with open(f"{models_dir}/scaler.pkl", "wb") as f:
-                pickle.dump(self.scaler, f)
+            os.makedirs(MODELS_DIR, exist_ok=True)
+            np.savez_compressed(
+                MODEL_ARRAYS_PATH,
+                **_linear_arrays("battery", self.battery_model),
+                **_linear_arrays("demand", self.demand_model),
+                **_anomaly_arrays(self.anomaly_bounds)
+            )
                 
         except Exception as e:
             logger.error(f"Error saving models: {e}")
@@ -191,33 +410,28 @@ class EnergyMLService:
     def load_models(self):
         """Load trained models from disk"""
         try:
-            models_dir = "models"
+            if not os.path.exists(MODEL_ARRAYS_PATH):
+                return False
             
-            if os.path.exists(f"{models_dir}/battery_model.pkl"):
-                with open(f"{models_dir}/battery_model.pkl", "rb") as f:
-                    self.battery_model = pickle.load(f)
-                    
-                with open(f"{models_dir}/demand_model.pkl", "rb") as f:
-                    self.demand_model = pickle.load(f)
-                    
-                with open(f"{models_dir}/anomaly_detector.pkl", "rb") as f:
-                    self.anomaly_detector = pickle.load(f)
-                    
-                with open(f"{models_dir}/scaler.pkl", "rb") as f:
-                    self.scaler = pickle.load(f)
-                    
-                self.models_trained = True
-                logger.info("ML models loaded successfully")
-                return True
+            # allow_pickle stays off: this file can only hold arrays
+            with np.load(MODEL_ARRAYS_PATH) as arrays:
+                self.battery_model = _restore_linear(arrays, "battery")
+                self.demand_model = _restore_linear(arrays, "demand")
+                self.anomaly_bounds = _restore_anomaly_bounds(arrays)
+                
+            self.models_trained = True
+            self._cache_coefficients()
+            self._clear_prediction_caches()
+            logger.info("ML models loaded successfully")
+            return True
                 
         except Exception as e:
             logger.error(f"Error loading models: {e}")
             
         return False
 
-# Global ML service instance
+# Global ML service instance; processes that serve predictions call load_models() at startup
 ml_service = EnergyMLService()
-ml_service.load_models()
 
 # Convenience functions for backward compatibility
 def predict_battery_sustain(battery_voltage, output_power):
@@ -7,18 +7,77 @@ import logging
 from twilio.rest import Client
 from config import Config
 import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime
-from services.firebase_service import db
+from core.timestamps import utc_now_iso, utc_now_iso_precise
+from services.firebase_service import cached_ref, generate_push_id, write_buffer
 
 logger = logging.getLogger(__name__)
 
+# A session idle longer than this is probed with NOOP before reuse
+SMTP_IDLE_CHECK = 60  # seconds
+
+# Channels are independent network calls, so alerts send them in parallel
+_channel_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="notify")
+
+def _gather_channels(futures):
+    """Wait for per-channel sends and collect their results by channel"""
+    return {channel: future.result() for channel, future in futures.items()}
+
 class NotificationService:
     def __init__(self):
         self.twilio_client = None
         if Config.TWILIO_SID and Config.TWILIO_AUTH:
             self.twilio_client = Client(Config.TWILIO_SID, Config.TWILIO_AUTH)
+        
+        # One logged-in SMTP session is reused across emails; sends are serialized on it
+        self._smtp = None
+        self._smtp_last_used = 0
+        self._smtp_lock = threading.Lock()
+    
+    def _connect_smtp(self):
+        """Open a new SMTP session with STARTTLS and login"""
+        server = smtplib.SMTP(Config.SMTP_HOST, Config.SMTP_PORT)
+        server.starttls()
+        server.login(Config.ADMIN_EMAIL, Config.EMAIL_PASSWORD)
+        return server
+    
+    def _close_smtp(self):
+        """Drop the cached SMTP session"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+    
+    def _get_smtp(self):
+        """Cached SMTP session, reconnecting if it has gone stale; call under _smtp_lock"""
+        if self._smtp is not None and time.monotonic() - self._smtp_last_used > SMTP_IDLE_CHECK:
+            try:
+                self._smtp.noop()
+            except smtplib.SMTPException:
+                self._close_smtp()
+        if self._smtp is None:
+            self._smtp = self._connect_smtp()
+        return self._smtp
+    
+    def _send_smtp_message(self, msg):
+        """Send over the cached session, reconnecting once if the server hung up"""
+        with self._smtp_lock:
+            self._get_smtp()
+            try:
+                self._smtp.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = self._connect_smtp()
+                self._smtp.send_message(msg)
+            except Exception:
+                self._close_smtp()
+                raise
+            self._smtp_last_used = time.monotonic()
     
     def send_sms(self, to, message, priority="NORMAL"):
         """Send SMS notification using Twilio"""
@@ -45,22 +104,13 @@ class NotificationService:
     def send_email(self, to, subject, message, priority="NORMAL"):
         """Send email notification"""
         try:
-            smtp_server = "smtp.gmail.com"
-            smtp_port = 587
-            sender_email = Config.ADMIN_EMAIL
-            sender_password = Config.EMAIL_PASSWORD  # store in config
-            
             msg = MIMEMultipart()
-            msg['From'] = sender_email
+            msg['From'] = Config.ADMIN_EMAIL
             msg['To'] = to
             msg['Subject'] = subject
             msg.attach(MIMEText(message, 'plain'))
             
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            server.quit()
+            self._send_smtp_message(msg)
             
             logger.info(f"Email sent successfully to {to}")
             self._log_notification("EMAIL", to, f"{subject}: {message}", "SENT", priority)
@@ -77,13 +127,12 @@ class NotificationService:
             notification_data = {
                 "title": title,
                 "body": body,
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": utc_now_iso_precise(),
                 "data": data or {},
                 "read": False
             }
             
-            ref = db.reference(f"notifications/{user_id}")
-            ref.push(notification_data)
+            cached_ref(f"notifications/{user_id}").push(notification_data)
             
             logger.info(f"Firebase notification sent to user {user_id}")
             self._log_notification("FIREBASE", user_id, f"{title}: {body}", "SENT")
@@ -96,7 +145,7 @@ class NotificationService:
     
     def send_emergency_alert(self, alert_type, details, affected_zones=None):
         """Send emergency alert through all channels"""
-        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = utc_now_iso().replace("T", " ")
         
         message = f"🚨 EMERGENCY ALERT 🚨\n"
         message += f"Type: {alert_type}\n"
@@ -104,52 +153,58 @@ class NotificationService:
         message += f"Details: {details}\n"
         
         if affected_zones:
+            # The same zone can be reported by several checks; list it once
+            affected_zones = list(dict.fromkeys(affected_zones))
             message += f"Affected Zones: {', '.join(affected_zones)}\n"
         
         message += "Immediate action required!"
         
-        results = {}
+        futures = {}
         
         if Config.ADMIN_PHONE:
-            results["sms"] = self.send_sms(Config.ADMIN_PHONE, message, "EMERGENCY")
+            futures["sms"] = _channel_executor.submit(self.send_sms, Config.ADMIN_PHONE, message, "EMERGENCY")
         
         if Config.ADMIN_EMAIL:
-            results["email"] = self.send_email(
+            futures["email"] = _channel_executor.submit(
+                self.send_email,
                 Config.ADMIN_EMAIL, 
                 f"EMERGENCY: {alert_type}", 
                 message, 
                 "EMERGENCY"
             )
         
-        results["firebase"] = self.send_firebase_notification(
+        futures["firebase"] = _channel_executor.submit(
+            self.send_firebase_notification,
             "admin", 
             f"Emergency: {alert_type}", 
             details,
             {"type": "emergency", "zones": affected_zones}
         )
         
-        return results
+        return _gather_channels(futures)
     
     def send_low_battery_alert(self, battery_level, affected_zones):
         """Send low battery alert"""
+        affected_zones = list(dict.fromkeys(affected_zones))
         message = f"⚠️ Low Battery Alert\n"
         message += f"Battery Level: {battery_level:.1f}%\n"
         message += f"Affected Zones: {', '.join(affected_zones)}\n"
-        message += f"Time: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
+        message += f"Time: {utc_now_iso().replace('T', ' ')}"
         
-        results = {}
+        futures = {}
         
         if Config.ADMIN_PHONE:
-            results["sms"] = self.send_sms(Config.ADMIN_PHONE, message, "HIGH")
+            futures["sms"] = _channel_executor.submit(self.send_sms, Config.ADMIN_PHONE, message, "HIGH")
         
-        results["firebase"] = self.send_firebase_notification(
+        futures["firebase"] = _channel_executor.submit(
+            self.send_firebase_notification,
             "admin",
             "Low Battery Warning",
             f"Battery at {battery_level:.1f}%",
             {"type": "low_battery", "level": battery_level}
         )
         
-        return results
+        return _gather_channels(futures)
     
     def send_admin_message_to_household(self, household_id, message):
         """Send message from admin to specific household"""
@@ -157,13 +212,12 @@ class NotificationService:
             notification_data = {
                 "title": "Message from Admin",
                 "body": message,
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": utc_now_iso_precise(),
                 "type": "admin_message",
                 "read": False
             }
             
-            ref = db.reference(f"notifications/household_{household_id}")
-            ref.push(notification_data)
+            cached_ref(f"notifications/household_{household_id}").push(notification_data)
             
             logger.info(f"Admin message sent to household {household_id}")
             return True
@@ -173,7 +227,7 @@ class NotificationService:
             return False
     
     def _log_notification(self, channel, recipient, message, status, priority="NORMAL"):
-        """Log notification to Firebase (instead of SQL DB)"""
+        """Log notification to Firebase (instead of SQL DB), batched with other buffered writes"""
         try:
             log_data = {
                 "channel": channel,
@@ -181,11 +235,11 @@ class NotificationService:
                 "message": message,
                 "status": status,
                 "priority": priority,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": utc_now_iso_precise()
             }
             
-            ref = db.reference("notification_logs")
-            ref.push(log_data)
+            # Keys are generated locally, so the write joins the next multi-path flush
+            write_buffer.write(f"notification_logs/{generate_push_id()}", log_data)
             
         except Exception as e:
             logger.error(f"Error logging notification: {e}")
@@ -4,10 +4,13 @@ Implements greedy algorithm and dynamic programming for relay scheduling
 """
 
 import logging
+import time
+import numpy as np
+from functools import lru_cache
 from datetime import datetime, timedelta
 from config import Config
 from services.ml_service import ml_service
-from services.firebase_service import set_command
+from services.firebase_service import set_commands
 from core.logger import log_energy_decision
 
 logger = logging.getLogger(__name__)
@@ -15,34 +18,51 @@ logger = logging.getLogger(__name__)
 class EnergyOptimizer:
     def __init__(self):
         self.zones = Config.ZONES
+        # Priorities are static, so sort once (lower number = higher priority)
+        self.zones_by_priority = sorted(self.zones.items(), key=lambda x: x[1]["priority"])
+        self.zone_names_by_priority = [zone for zone, _ in self.zones_by_priority]
+        # Flat (zone, type) pairs so the mode loops don't re-read each zone's config
+        self.zone_types = [(zone, config["type"]) for zone, config in self.zones.items()]
+        # Emergency decisions depend only on zone type, so build them once
+        self._emergency_decisions = {
+            zone: "ON" if zone_type == "critical" else "OFF" for zone, zone_type in self.zone_types
+        }
+        # (key, schedule) of the last schedule built - swapped as one tuple
+        self._schedule_cache = (None, None)
         
-    def optimize_energy_allocation(self, sensor_data, forecast_hours=6):
+    def optimize_energy_allocation(self, sensor_data, forecast_hours=6, execute=True):
         """
         Main optimization function using greedy algorithm + dynamic programming
+        Pass execute=False to compute decisions without sending any commands
         """
         try:
             decisions = {}
             optimization_data = {
+                # One clock read per cycle; every decision shares this timestamp
                 "timestamp": datetime.utcnow().isoformat(),
                 "sensor_data": sensor_data,
                 "decisions": {},
                 "reasoning": []
             }
             
-            # Calculate overall system state
-            total_input = sum(zone.get("inputPower", 0) for zone in sensor_data.values())
-            total_output = sum(zone.get("outputPower", 0) for zone in sensor_data.values())
-            avg_battery = sum(zone.get("batteryPercentage", 50) for zone in sensor_data.values()) / len(sensor_data)
+            # Calculate overall system state from one array of readings
+            total_input, total_output, total_battery = self._sensor_arrays(sensor_data).sum(axis=0).tolist()
+            avg_battery = total_battery / len(sensor_data)
             
-            # Get battery sustain prediction
-            sample_zone_data = next(iter(sensor_data.values())) if sensor_data else {}
-            sustain_hours = ml_service.predict_battery_sustain(sample_zone_data)
+            # Predict battery sustain for every zone with one model call;
+            # the first zone still serves as the system-wide sample
+            zone_sustain_hours = dict(zip(
+                sensor_data.keys(),
+                ml_service.predict_battery_sustain_batch(list(sensor_data.values()))
+            ))
+            sustain_hours = next(iter(zone_sustain_hours.values()), 0)
             
             optimization_data["system_state"] = {
                 "total_input": total_input,
                 "total_output": total_output,
                 "avg_battery": avg_battery,
-                "sustain_hours": sustain_hours
+                "sustain_hours": sustain_hours,
+                "zone_sustain_hours": zone_sustain_hours
             }
             
             # Apply optimization strategy based on battery level
@@ -63,13 +83,21 @@ class EnergyOptimizer:
                 optimization_data["reasoning"].append("Normal mode: Sufficient battery")
             
             # Apply load balancing
-            decisions = self._apply_load_balancing(decisions, sensor_data)
+            decisions = self._apply_load_balancing(decisions, sensor_data, total_available=total_input)
             optimization_data["reasoning"].append("Applied load balancing")
             
             optimization_data["decisions"] = decisions
             
+            if not execute:
+                return {
+                    "success": True,
+                    "decisions": decisions,
+                    "system_state": optimization_data["system_state"],
+                    "reasoning": optimization_data["reasoning"]
+                }
+            
             # Execute decisions
-            execution_results = self._execute_decisions(decisions)
+            execution_results = self._execute_decisions(decisions, optimization_data["timestamp"])
             optimization_data["execution_results"] = execution_results
             
             # Log the optimization decision
@@ -89,19 +117,13 @@ class EnergyOptimizer:
     
     def _emergency_mode(self, sensor_data):
         """Emergency mode: Only critical zones ON"""
-        decisions = {}
-        for zone, config in self.zones.items():
-            if config["type"] == "critical":
-                decisions[zone] = "ON"
-            else:
-                decisions[zone] = "OFF"
-        return decisions
+        return dict(self._emergency_decisions)
     
     def _critical_mode(self, sensor_data):
         """Critical mode: Critical + essential semi-critical only"""
         decisions = {}
-        for zone, config in self.zones.items():
-            if config["type"] in ["critical", "semi-critical"]:
+        for zone, zone_type in self.zone_types:
+            if zone_type in ("critical", "semi-critical"):
                 # Check if zone has sufficient input power
                 zone_data = sensor_data.get(zone, {})
                 input_power = zone_data.get("inputPower", 0)
@@ -117,17 +139,18 @@ class EnergyOptimizer:
         """Conservation mode: Selective operation based on efficiency"""
         decisions = {}
         
+        efficiencies = self._zone_efficiencies(sensor_data)
+        
         # Always keep critical zones ON
-        for zone, config in self.zones.items():
-            if config["type"] == "critical":
+        for zone, zone_type in self.zone_types:
+            if zone_type == "critical":
                 decisions[zone] = "ON"
             else:
-                zone_data = sensor_data.get(zone, {})
-                efficiency = self._calculate_efficiency(zone_data)
+                efficiency = efficiencies[zone]
                 
-                if config["type"] == "semi-critical" and efficiency > 0.7:
+                if zone_type == "semi-critical" and efficiency > 0.7:
                     decisions[zone] = "ON"
-                elif config["type"] == "non-critical" and efficiency > 0.8:
+                elif zone_type == "non-critical" and efficiency > 0.8:
                     decisions[zone] = "ON"
                 else:
                     decisions[zone] = "OFF"
@@ -137,25 +160,23 @@ class EnergyOptimizer:
     def _normal_mode(self, sensor_data, sustain_hours):
         """Normal mode: Optimize for efficiency and comfort"""
         decisions = {}
+        efficiencies = self._zone_efficiencies(sensor_data)
         
-        for zone, config in self.zones.items():
-            zone_data = sensor_data.get(zone, {})
-            
+        for zone, zone_type in self.zone_types:
             # Critical zones always ON
-            if config["type"] == "critical":
+            if zone_type == "critical":
                 decisions[zone] = "ON"
                 continue
                 
             # For other zones, consider multiple factors
-            efficiency = self._calculate_efficiency(zone_data)
-            demand_score = self._calculate_demand_score(zone, config)
+            efficiency = efficiencies[zone]
             
             # Decision matrix
-            if config["type"] == "semi-critical":
+            if zone_type == "semi-critical":
                 decisions[zone] = "ON" if efficiency > 0.6 else "OFF"
-            elif config["type"] == "non-critical":
+            elif zone_type == "non-critical":
                 decisions[zone] = "ON" if efficiency > 0.7 and sustain_hours > 4 else "OFF"
-            elif config["type"] == "deferrable":
+            elif zone_type == "deferrable":
                 decisions[zone] = "ON" if efficiency > 0.8 and sustain_hours > 8 else "OFF"
             else:
                 decisions[zone] = "OFF"
@@ -177,9 +198,36 @@ class EnergyOptimizer:
         
         return (power_efficiency * 0.7) + (voltage_factor * 0.3)
     
-    def _calculate_demand_score(self, zone, config):
-        """Calculate demand score based on time and zone type"""
-        current_hour = datetime.now().hour
+    def _calculate_efficiency_batch(self, zone_data_list):
+        """Efficiency scores for several zones, computed in one vectorized pass"""
+        try:
+            features = np.array([[
+                data.get("inputPower", 0),
+                data.get("outputPower", 0),
+                data.get("batteryVoltage", 12)
+            ] for data in zone_data_list], dtype=float).reshape(-1, 3)
+        except (TypeError, ValueError):
+            return [self._calculate_efficiency(data) for data in zone_data_list]
+        
+        input_power, output_power, battery_voltage = features.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            power_efficiency = np.minimum(output_power / input_power, 1.0)
+        voltage_factor = np.minimum(battery_voltage / 12.6, 1.0)
+        
+        efficiency = (power_efficiency * 0.7) + (voltage_factor * 0.3)
+        return np.where(input_power > 0, efficiency, 0.0).tolist()
+    
+    def _zone_efficiencies(self, sensor_data):
+        """Efficiency score of every configured zone, keyed by zone name"""
+        return dict(zip(
+            self.zones,
+            self._calculate_efficiency_batch([sensor_data.get(zone, {}) for zone in self.zones])
+        ))
+    
+    def _calculate_demand_score(self, zone, config, current_hour=None):
+        """Calculate demand score based on time and zone type; pass current_hour when scoring many zones"""
+        if current_hour is None:
+            current_hour = datetime.now().hour
         
         # Time-based demand scoring
         if config["type"] == "semi-critical":  # Street lights
@@ -191,53 +239,60 @@ class EnergyOptimizer:
             
         return 0.5
     
-    def _apply_load_balancing(self, decisions, sensor_data):
+    @staticmethod
+    def _sensor_arrays(sensor_data):
+        """Readings as an (n_zones, 3) array of input power, output power and battery %"""
+        return np.array([
+            (data.get("inputPower", 0), data.get("outputPower", 0), data.get("batteryPercentage", 50))
+            for data in sensor_data.values()
+        ], dtype=float).reshape(-1, 3)
+    
+    def _apply_load_balancing(self, decisions, sensor_data, total_available=None):
         """Apply load balancing to prevent overload"""
-        total_projected_load = 0
+        # Projected load of every zone in priority order, 0 for zones staying OFF
+        loads = np.array([
+            sensor_data.get(zone, {}).get("outputPower", 0) if decisions.get(zone) == "ON" else 0
+            for zone in self.zone_names_by_priority
+        ], dtype=float)
         
-        # Calculate projected total load if all decisions are executed
-        for zone, decision in decisions.items():
-            if decision == "ON":
-                zone_data = sensor_data.get(zone, {})
-                total_projected_load += zone_data.get("outputPower", 0)
-        
-        # Get total available power
-        total_available = sum(zone.get("inputPower", 0) for zone in sensor_data.values())
+        # Get total available power, unless the caller already summed it
+        if total_available is None:
+            total_available = float(self._sensor_arrays(sensor_data)[:, 0].sum())
+        capacity = total_available * 0.9  # 90% safety margin
         
         # If projected load exceeds available power, prioritize by zone priority
-        if total_projected_load > total_available * 0.9:  # 90% safety margin
+        cumulative_load = np.cumsum(loads)
+        if len(loads) and cumulative_load[-1] > capacity:
             logger.warning("Load balancing required - reducing non-essential loads")
             
-            # Sort zones by priority (lower number = higher priority)
-            sorted_zones = sorted(
-                self.zones.items(), 
-                key=lambda x: x[1]["priority"]
-            )
-            
-            current_load = 0
-            for zone_name, zone_config in sorted_zones:
-                if decisions.get(zone_name) == "ON":
-                    zone_data = sensor_data.get(zone_name, {})
-                    zone_load = zone_data.get("outputPower", 0)
-                    
-                    if current_load + zone_load <= total_available * 0.9:
-                        current_load += zone_load
-                    else:
-                        decisions[zone_name] = "OFF"
-                        logger.info(f"Load balancing: Turned OFF {zone_name}")
+            # Every zone before the first overflow fits as-is; only the tail
+            # needs the greedy pass, where smaller loads may still squeeze in
+            first_over = int(np.argmax(cumulative_load > capacity))
+            current_load = cumulative_load[first_over - 1] if first_over else 0
+            for zone_name, zone_load in zip(self.zone_names_by_priority[first_over:], loads[first_over:]):
+                if decisions.get(zone_name) != "ON":
+                    continue
+                if current_load + zone_load <= capacity:
+                    current_load += zone_load
+                else:
+                    decisions[zone_name] = "OFF"
+                    logger.info(f"Load balancing: Turned OFF {zone_name}")
         
         return decisions
     
-    def _execute_decisions(self, decisions):
-        """Execute optimization decisions by sending commands"""
+    def _execute_decisions(self, decisions, timestamp=None):
+        """Execute optimization decisions by sending all commands in one batched write"""
         results = {}
+        sent = set_commands(decisions)
+        if timestamp is None:
+            timestamp = datetime.utcnow().isoformat()
         
         for zone, command in decisions.items():
-            success = set_command(zone, command)
+            success = sent.get(zone, False)
             results[zone] = {
                 "command": command,
                 "success": success,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp
             }
             
             if not success:
@@ -246,24 +301,37 @@ class EnergyOptimizer:
         return results
     
     def get_optimization_schedule(self, hours_ahead=24):
-        """Generate optimization schedule for next N hours"""
+        """
+        Generate optimization schedule for next N hours. The schedule is reused
+        for the rest of the minute unless the models change; treat it as read-only.
+        """
+        key = (int(time.time() // 60), hours_ahead, ml_service.model_version)
+        cached_key, cached_schedule = self._schedule_cache
+        if cached_key == key:
+            return cached_schedule
+        
+        schedule = self._build_optimization_schedule(hours_ahead)
+        self._schedule_cache = (key, schedule)
+        return schedule
+    
+    def _build_optimization_schedule(self, hours_ahead):
+        """Uncached optimization schedule"""
         schedule = []
         current_time = datetime.now()
+        future_times = [current_time + timedelta(hours=hour) for hour in range(hours_ahead)]
         
-        for hour in range(hours_ahead):
-            future_time = current_time + timedelta(hours=hour)
-            hour_of_day = future_time.hour
-            day_of_week = future_time.weekday()
-            
-            # Predict solar generation (simplified)
-            solar_forecast = self._predict_solar_generation(hour_of_day)
-            
-            # Predict demand
-            predicted_demand = ml_service.predict_demand(hour_of_day, day_of_week, solar_forecast)
-            
+        # Predict solar generation (simplified) and demand; both repeat across
+        # scheduler runs, so they come from memoized lookups
+        solar_forecasts = [self._predict_solar_generation(t.hour) for t in future_times]
+        predicted_demands = [
+            ml_service.predict_demand(t.hour, t.weekday(), solar)
+            for t, solar in zip(future_times, solar_forecasts)
+        ]
+        
+        for future_time, solar_forecast, predicted_demand in zip(future_times, solar_forecasts, predicted_demands):
             schedule.append({
                 "time": future_time.isoformat(),
-                "hour": hour_of_day,
+                "hour": future_time.hour,
                 "predicted_solar": solar_forecast,
                 "predicted_demand": predicted_demand,
                 "recommended_action": self._get_recommended_action(predicted_demand, solar_forecast)
@@ -271,7 +339,9 @@ class EnergyOptimizer:
         
         return schedule
     
-    def _predict_solar_generation(self, hour):
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _predict_solar_generation(hour):
         """Simple solar generation prediction based on time"""
         if 6 <= hour <= 18:
             # Peak solar at noon (12), tapering off
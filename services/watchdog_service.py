@@ -3,26 +3,82 @@ Watchdog service to ensure system reliability
 Monitors Firebase connections, retries failed commands, and maintains system health
 """
 
+import calendar
+import heapq
+import re
 import time
 import threading
 import logging
-from datetime import datetime, timedelta
-from services.firebase_service import get_sensor_data, set_command, get_all_zone_commands
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from services.firebase_service import get_sensor_data, set_commands, get_all_zone_commands
 from services.notification_service import notification_service
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# The per-tick Firebase reads are independent, so they run side by side
+_watchdog_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="watchdog")
+# Upper bound on how long a tick waits for any one read
+READ_TIMEOUT = 15  # seconds
+CHECK_INTERVAL = 30  # seconds between watchdog ticks
+RETRY_DELAY = 300  # seconds before a failed command is retried
+STALE_DATA_AGE = 600  # seconds before sensor data counts as stale
+ALERT_COOLDOWN = 600  # seconds before the same alert is sent again
+
+# UTC ISO-8601 timestamps as devices send them: naive or 'Z', optional fraction
+_UTC_ISO_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})(?:\.\d+)?Z?$")
+
+def _timestamp_to_epoch(value):
+    """Epoch seconds for a sensor timestamp; naive ISO strings are taken as UTC"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    
+    match = _UTC_ISO_RE.match(value)
+    if match:
+        return calendar.timegm(tuple(map(int, match.groups())) + (0, 0, 0))
+    
+    # Explicit offsets and other ISO variants take the slow path
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+@dataclass(slots=True)
+class FailedCommand:
+    """A zone command awaiting retry"""
+    command: str
+    reason: str
+    timestamp: float
+    retry_count: int = 0
+    next_retry: float = 0.0
+
 class WatchdogService:
     def __init__(self):
         self.running = False
+        # zone -> FailedCommand; only the watchdog thread touches it
         self.failed_commands = {}
+        # Read-only copy of failed_commands for get_watchdog_status, rebuilt by the
+        # watchdog thread after a tick that changed it
+        self._status_dirty = False
+        self._failed_command_details = {}
+        # (retry deadline, zone) for failed commands; entries whose deadline no longer
+        # matches failed_commands are stale and skipped when popped
+        self._retry_heap = []
         self.last_data_timestamp = {}
         self.connection_failures = 0
+        # (alert type, zones) -> when that alert was last sent, so a lasting fault isn't re-sent every tick
+        self._alert_sent_at = {}
+        # Zone config is static, so the critical set is built once
+        self._critical_zones = frozenset(Config.ZONES_BY_TYPE.get("critical", ()))
+        # Set to cut the current wait short: on stop() or when a new failure is recorded
+        self._wake = threading.Event()
         
     def start(self):
         """Start watchdog monitoring"""
         self.running = True
+        self._wake.clear()
         
         # Start watchdog thread
         watchdog_thread = threading.Thread(target=self._watchdog_loop)
@@ -34,34 +90,86 @@ class WatchdogService:
     def stop(self):
         """Stop watchdog monitoring"""
         self.running = False
+        self.wake()
         logger.info("Watchdog service stopped")
     
+    def wake(self):
+        """Run the next watchdog tick now instead of at the end of the current wait"""
+        self._wake.set()
+    
+    def _wait(self, timeout):
+        """Wait for the next tick, returning early if woken"""
+        self._wake.wait(timeout)
+        self._wake.clear()
+    
     def _watchdog_loop(self):
         """Main watchdog monitoring loop"""
         while self.running:
             try:
+                # Read sensors and commands once per tick and share them between the checks
+                sensor_data, commands = self._fetch_snapshot()
+                
                 # Check Firebase connectivity
-                self._check_firebase_connectivity()
+                self._check_firebase_connectivity(sensor_data)
                 
                 # Monitor command execution
-                self._monitor_command_execution()
+                self._monitor_command_execution(commands)
                 
                 # Check data freshness
-                self._check_data_freshness()
+                self._check_data_freshness(sensor_data)
                 
                 # Retry failed commands
                 self._retry_failed_commands()
                 
-                time.sleep(30)  # Check every 30 seconds
+                self._refresh_status_snapshot()
+                
+                # Check every 30 seconds, or sooner if a retry falls due first
+                self._wait(self._next_wait())
                 
             except Exception as e:
-                logger.error(f"Watchdog loop error: {e}")
-                time.sleep(60)  # Wait longer on error
+                logger.error("Watchdog loop error: %s", e)
+                self._wait(60)  # Wait longer on error
+    
+    def _next_wait(self):
+        """Seconds until the next tick: the check interval or the earliest retry deadline"""
+        if not self._retry_heap:
+            return CHECK_INTERVAL
+        return max(0, min(CHECK_INTERVAL, self._retry_heap[0][0] - time.time()))
+    
+    def _fetch_snapshot(self):
+        """Sensor data and zone commands, read concurrently; a read that times out is None"""
+        futures = (
+            _watchdog_executor.submit(self._fetch_sensor_data),
+            _watchdog_executor.submit(self._fetch_zone_commands)
+        )
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=READ_TIMEOUT))
+            except FutureTimeoutError:
+                logger.error("Watchdog Firebase read timed out after %ss", READ_TIMEOUT)
+                results.append(None)
+        return tuple(results)
+    
+    def _fetch_sensor_data(self):
+        """Sensor snapshot for this tick, or None if Firebase couldn't be read"""
+        try:
+            return get_sensor_data()
+        except Exception as e:
+            logger.error("Firebase connectivity check failed: %s", e)
+            return None
+    
+    def _fetch_zone_commands(self):
+        """Zone commands for this tick, or None if Firebase couldn't be read"""
+        try:
+            return get_all_zone_commands()
+        except Exception as e:
+            logger.error("Command monitoring error: %s", e)
+            return None
     
-    def _check_firebase_connectivity(self):
-        """Check if Firebase is responding"""
+    def _check_firebase_connectivity(self, data):
+        """Check if Firebase is responding, given this tick's sensor read"""
         try:
-            data = get_sensor_data()
             if data:
                 self.connection_failures = 0
             else:
@@ -70,7 +178,7 @@ class WatchdogService:
             # Alert if connection fails multiple times
             if self.connection_failures >= 3:
                 logger.error("Firebase connectivity issues detected")
-                notification_service.send_emergency_alert(
+                self._send_alert(
                     "FIREBASE_CONNECTION_FAILURE",
                     f"Firebase connection failed {self.connection_failures} times",
                     []
@@ -79,111 +187,148 @@ class WatchdogService:
                 
         except Exception as e:
             self.connection_failures += 1
-            logger.error(f"Firebase connectivity check failed: {e}")
+            logger.error("Firebase connectivity check failed: %s", e)
     
-    def _monitor_command_execution(self):
+    def _monitor_command_execution(self, commands):
         """Monitor if commands are being executed properly"""
+        if not commands:
+            return
+        
         try:
-            commands = get_all_zone_commands()
             current_time = time.time()
             
+            # get_all_zone_commands only returns dict records
             for zone, command_data in commands.items():
-                if isinstance(command_data, dict):
-                    command_timestamp = command_data.get("timestamp", 0)
-                    command = command_data.get("command")
-                    
-                    # If command is older than 2 minutes, consider it failed
-                    if current_time - command_timestamp > 120:
-                        logger.warning(f"Command timeout for {zone}: {command}")
-                        self._handle_failed_command(zone, command, "TIMEOUT")
+                # Commands are stamped with lastUpdated when written
+                command_timestamp = command_data.get("lastUpdated", command_data.get("timestamp", 0))
+                command = command_data.get("command")
+                
+                # If command is older than 2 minutes, consider it failed
+                if current_time - command_timestamp > 120:
+                    logger.warning("Command timeout for %s: %s", zone, command)
+                    self._handle_failed_command(zone, command, "TIMEOUT")
         
         except Exception as e:
-            logger.error(f"Command monitoring error: {e}")
+            logger.error("Command monitoring error: %s", e)
     
-    def _check_data_freshness(self):
+    def _check_data_freshness(self, sensor_data):
         """Check if sensor data is fresh"""
+        if not sensor_data:
+            return
+        
         try:
-            sensor_data = get_sensor_data()
-            current_time = datetime.utcnow()
+            now = time.time()
             
             for zone, data in sensor_data.items():
                 # Check if data has a timestamp
                 data_timestamp = data.get("timestamp")
                 if data_timestamp:
                     try:
-                        data_time = datetime.fromisoformat(data_timestamp.replace('Z', '+00:00'))
-                        age_minutes = (current_time - data_time).total_seconds() / 60
+                        age_seconds = now - _timestamp_to_epoch(data_timestamp)
                         
                         # Alert if data is older than 10 minutes
-                        if age_minutes > 10:
-                            logger.warning(f"Stale data detected for {zone}: {age_minutes:.1f} minutes old")
+                        if age_seconds > STALE_DATA_AGE:
+                            age_minutes = age_seconds / 60
+                            logger.warning("Stale data detected for %s: %.1f minutes old", zone, age_minutes)
                             
                             # Send alert for critical zones only
-                            if Config.ZONES.get(zone, {}).get("type") == "critical":
-                                notification_service.send_emergency_alert(
+                            if zone in self._critical_zones:
+                                self._send_alert(
                                     "STALE_DATA_CRITICAL",
                                     f"Critical zone {zone} data is {age_minutes:.1f} minutes old",
                                     [zone]
                                 )
                     except Exception as e:
-                        logger.error(f"Error parsing timestamp for {zone}: {e}")
+                        logger.error("Error parsing timestamp for %s: %s", zone, e)
         
         except Exception as e:
-            logger.error(f"Data freshness check error: {e}")
+            logger.error("Data freshness check error: %s", e)
+    
+    def _send_alert(self, alert_type, message, zones):
+        """Send an emergency alert unless the same alert went out within ALERT_COOLDOWN"""
+        key = (alert_type, tuple(zones))
+        now = time.time()
+        if now - self._alert_sent_at.get(key, 0) <= ALERT_COOLDOWN:
+            return
+        
+        self._alert_sent_at[key] = now
+        notification_service.send_emergency_alert(alert_type, message, zones)
     
     def _retry_failed_commands(self):
-        """Retry commands that failed previously"""
+        """Retry commands whose retry deadline has passed, sending them in one batched write"""
         current_time = time.time()
-        zones_to_remove = []
+        due_commands = {}
         
-        for zone, failure_data in self.failed_commands.items():
-            # Retry after 5 minutes
-            if current_time - failure_data["timestamp"] > 300:
-                command = failure_data["command"]
-                retry_count = failure_data.get("retry_count", 0)
-                
-                if retry_count < 3:  # Max 3 retries
-                    logger.info(f"Retrying failed command: {zone} -> {command}")
-                    success = set_command(zone, command)
-                    
-                    if success:
-                        logger.info(f"Retry successful for {zone}")
-                        zones_to_remove.append(zone)
-                    else:
-                        self.failed_commands[zone]["retry_count"] = retry_count + 1
-                        self.failed_commands[zone]["timestamp"] = current_time
-                else:
-                    # Max retries reached
-                    logger.error(f"Max retries reached for {zone}, giving up")
-                    notification_service.send_emergency_alert(
-                        "COMMAND_RETRY_FAILURE",
-                        f"Failed to execute command for {zone} after 3 retries: {command}",
-                        [zone]
-                    )
-                    zones_to_remove.append(zone)
+        # Only the due entries are popped; the rest of the heap isn't touched
+        while self._retry_heap and self._retry_heap[0][0] <= current_time:
+            deadline, zone = heapq.heappop(self._retry_heap)
+            failure_data = self.failed_commands.get(zone)
+            if failure_data is None or failure_data.next_retry != deadline:
+                continue  # Resolved or rescheduled since this entry was pushed
+            
+            command = failure_data.command
+            if failure_data.retry_count < 3:  # Max 3 retries
+                logger.info("Retrying failed command: %s -> %s", zone, command)
+                due_commands[zone] = command
+            else:
+                # Max retries reached
+                logger.error("Max retries reached for %s, giving up", zone)
+                self._send_alert(
+                    "COMMAND_RETRY_FAILURE",
+                    f"Failed to execute command for {zone} after 3 retries: {command}",
+                    [zone]
+                )
+                del self.failed_commands[zone]
+                self._status_dirty = True
         
-        # Remove resolved or expired failures
-        for zone in zones_to_remove:
-            del self.failed_commands[zone]
+        for zone, success in set_commands(due_commands).items():
+            if success:
+                logger.info("Retry successful for %s", zone)
+                del self.failed_commands[zone]
+                self._status_dirty = True
+            else:
+                failure_data = self.failed_commands[zone]
+                failure_data.retry_count += 1
+                failure_data.timestamp = current_time
+                self._schedule_retry(zone, current_time + RETRY_DELAY)
+    
+    def _schedule_retry(self, zone, deadline):
+        """Set the zone's retry deadline and queue it on the retry heap"""
+        self.failed_commands[zone].next_retry = deadline
+        self._status_dirty = True
+        heapq.heappush(self._retry_heap, (deadline, zone))
     
     def _handle_failed_command(self, zone, command, reason):
         """Handle a failed command"""
-        self.failed_commands[zone] = {
-            "command": command,
-            "reason": reason,
-            "timestamp": time.time(),
-            "retry_count": 0
-        }
+        existing = self.failed_commands.get(zone)
+        if existing is not None and existing.command == command:
+            # Still waiting on this failure's retry; keep its schedule and count
+            return
+        
+        now = time.time()
+        self.failed_commands[zone] = FailedCommand(command, reason, now)
+        self._schedule_retry(zone, now + RETRY_DELAY)
         
-        logger.warning(f"Command failed for {zone}: {command} (Reason: {reason})")
+        logger.warning("Command failed for %s: %s (Reason: %s)", zone, command, reason)
+    
+    def _refresh_status_snapshot(self):
+        """Rebuild the failed command details if this tick changed them"""
+        if not self._status_dirty:
+            return
+        self._status_dirty = False
+        self._failed_command_details = {
+            zone: asdict(failure_data) for zone, failure_data in self.failed_commands.items()
+        }
     
     def get_watchdog_status(self):
-        """Get current watchdog status"""
+        """Get current watchdog status from the last tick's snapshot"""
+        # The snapshot is replaced, never mutated, so it is safe to hand to other threads
+        details = self._failed_command_details
         return {
             "running": self.running,
             "connection_failures": self.connection_failures,
-            "failed_commands": len(self.failed_commands),
-            "failed_command_details": self.failed_commands
+            "failed_commands": len(details),
+            "failed_command_details": details
         }
 
 # Global watchdog service instance
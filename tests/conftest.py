@@ -0,0 +1,104 @@
+"""
+Shared test fixtures
+"""
+
+import os
+import pytest
+from config import Config
+
+# Under pytest-xdist every worker gets its own PostgreSQL schema so parallel
+# workers don't race on the same tables. Set before the app import below,
+# since the connection pool is built from this URL on first use
+XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+TEST_SCHEMA = f"test_{XDIST_WORKER}" if XDIST_WORKER else None
+
+if TEST_SCHEMA:
+    separator = "&" if "?" in Config.POSTGRES_URL else "?"
+    Config.POSTGRES_URL += f"{separator}options=-csearch_path%3D{TEST_SCHEMA}"
+
+from app import app
+from services.database_service import db_conn, initialize_database
+
+# Sensor snapshot served instead of Firebase during tests
+_FAKE_SENSOR_DATA = {
+    "Zone1": {"batteryVoltage": 12.5, "inputPower": 45.2, "outputPower": 38.7,
+              "solarGeneration": 25.3, "batteryPercentage": 85.2, "relayState": True},
+    "Zone2": {"batteryVoltage": 12.3, "inputPower": 30.1, "outputPower": 22.4,
+              "solarGeneration": 18.0, "batteryPercentage": 72.5, "relayState": True},
+    "Zone3": {"batteryVoltage": 12.1, "inputPower": 15.0, "outputPower": 12.8,
+              "solarGeneration": 9.6, "batteryPercentage": 64.0, "relayState": False},
+    "Zone4": {"batteryVoltage": 12.0, "inputPower": 10.5, "outputPower": 8.2,
+              "solarGeneration": 6.1, "batteryPercentage": 58.3, "relayState": False}
+}
+
+class _EmptyRef:
+    """Firebase reference stand-in: reads find nothing, writes go nowhere"""
+    key = "test-key"
+    
+    def get(self):
+        return None
+    
+    def set(self, value):
+        pass
+    
+    def update(self, value):
+        pass
+    
+    def delete(self):
+        pass
+    
+    def push(self, value=None):
+        return self
+    
+    def order_by_child(self, path):
+        return self
+    
+    def order_by_key(self):
+        return self
+    
+    def equal_to(self, value):
+        return self
+    
+    def end_at(self, value):
+        return self
+    
+    def limit_to_last(self, limit):
+        return self
+
+def _create_test_schema():
+    """Create this worker's schema; the search_path set above points at it"""
+    try:
+        with db_conn() as conn, conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {TEST_SCHEMA}")
+    except Exception as e:
+        print(f"Error creating test schema {TEST_SCHEMA}: {e}")
+
+@pytest.fixture(scope='session')
+def _app():
+    """Configure the app and create the schema once per test session"""
+    app.config['TESTING'] = True
+    app.config['JWT_SECRET_KEY'] = 'test-secret'
+    
+    with app.app_context():
+        if TEST_SCHEMA:
+            _create_test_schema()
+        initialize_database()
+    
+    yield app
+
+@pytest.fixture
+def client(_app):
+    """Fresh test client per test on the shared app"""
+    with _app.test_client() as client:
+        yield client
+
+@pytest.fixture(autouse=True)
+def _no_firebase(monkeypatch):
+    """Serve sensor reads and command writes from memory instead of Firebase"""
+    monkeypatch.setattr("services.firebase_service.cached_ref", lambda path: _EmptyRef())
+    monkeypatch.setattr("services.firebase_service.get_sensor_data",
+                        lambda: {zone: dict(data) for zone, data in _FAKE_SENSOR_DATA.items()})
+    monkeypatch.setattr("services.firebase_service.get_all_zone_commands", lambda: {})
+    monkeypatch.setattr("services.firebase_service.set_command", lambda zone, command, retry_count=3: True)
+    monkeypatch.setattr("services.firebase_service.set_commands",
+                        lambda commands, retry_count=3: dict.fromkeys(commands, True))
@@ -4,18 +4,6 @@ Test cases for authentication system
 
 import pytest
 import json
-from app import app
-from services.database_service import initialize_database
-
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    app.config['JWT_SECRET_KEY'] = 'test-secret'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            initialize_database()
-            yield client
 
 def test_login_success(client):
     """Test successful login"""
@@ -62,4 +50,11 @@ def test_role_based_access(client):
     response = client.get('/api/admin/overview', 
                          headers={'Authorization': f'Bearer {token}'})
     
-    assert response.status_code == 403
\ No newline at end of file
+    assert response.status_code == 403
+
+def test_login_non_string_password(client):
+    """Test a non-string password is rejected before hashing"""
+    response = client.post('/api/auth/login', 
+                          json={'username': 'admin', 'password': 12345})
+    
+    assert response.status_code == 400
@@ -5,42 +5,29 @@ Test cases for energy management system
 import pytest
 import json
 from unittest.mock import patch, MagicMock
-from app import app
 from services.ml_service import ml_service
 
-@pytest.fixture
-def client():
-    app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
-
-@pytest.fixture
-def admin_token(client):
-    """Get admin token for testing"""
-    response = client.post('/api/auth/login', 
-                          json={'email': 'admin@urjalink.com', 'password': 'admin123'})
+@pytest.fixture(scope='session')
+def admin_token(_app):
+    """Log in as admin once and share the token across tests"""
+    with _app.test_client() as client:
+        response = client.post('/api/auth/login', 
+                              json={'email': 'admin@urjalink.com', 'password': 'admin123'})
     return json.loads(response.data)['access_token']
 
-@patch('services.firebase_service.get_sensor_data')
-def test_energy_status(mock_get_sensor_data, client):
+@patch('routes.energy_routes.get_cached_collection')
+def test_energy_status(mock_get_cached_collection, client):
     """Test energy status endpoint"""
-    mock_get_sensor_data.return_value = {
-        "Zone1": {
-            "batteryVoltage": 12.5,
-            "inputPower": 45.2,
-            "outputPower": 38.7,
-            "solarGeneration": 25.3,
-            "batteryPercentage": 85.2,
-            "relayState": True
-        }
+    mock_get_cached_collection.return_value = {
+        "Zone1": {"voltage": 12.5, "lastUpdated": 1700000000}
     }
     
     response = client.get('/api/energy/status')
     
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert 'system_metrics' in data
-    assert 'zones' in data
+    assert data['zones'] == mock_get_cached_collection.return_value
+    mock_get_cached_collection.assert_called_once_with("zones")
 
 def test_battery_sustain_prediction():
     """Test battery sustain prediction"""
@@ -56,6 +43,25 @@ def test_battery_sustain_prediction():
     assert isinstance(sustain_hours, (int, float))
     assert sustain_hours >= 0
 
+def test_batch_demand_prediction_matches_single():
+    """Test batched demand prediction agrees with per-hour calls"""
+    rows = [[8, 1, 40.0], [12, 1, 100.0], [22, 1, 0.0]]
+    
+    batch = ml_service.predict_demand_batch(rows)
+    
+    assert batch == [ml_service.predict_demand(*row) for row in rows]
+
+def test_batch_zone_predictions_match_single():
+    """Test batched sustain and anomaly predictions agree with per-zone calls"""
+    zones = [
+        {"batteryVoltage": 12.5, "inputPower": 10, "outputPower": 38.7, "solarGeneration": 5},
+        {"batteryVoltage": 16, "inputPower": -1, "outputPower": 5},
+        {"outputPower": 0}
+    ]
+    
+    assert ml_service.predict_battery_sustain_batch(zones) == [ml_service.predict_battery_sustain(z) for z in zones]
+    assert ml_service.detect_anomaly_batch(zones) == [ml_service.detect_anomaly(z) for z in zones]
+
 def test_anomaly_detection():
     """Test anomaly detection"""
     normal_data = {
@@ -91,4 +97,78 @@ def test_invalid_zone_control(client, admin_token):
     
     assert response.status_code == 400
     data = json.loads(response.data)
-    assert 'Invalid zone' in data['message']
\ No newline at end of file
+    assert 'Invalid zone' in data['message']
+
+@patch('services.firebase_service.cached_ref')
+def test_write_buffer_flushes_single_update(mock_cached_ref):
+    """Test buffered writes are sent as one multi-path update"""
+    from services.firebase_service import WriteBuffer
+    
+    buffer = WriteBuffer()
+    buffer.pending = {"zones/Zone1/voltage": 12.3, "zones/Zone2/voltage": 11.9}
+    
+    assert buffer.flush()
+    mock_cached_ref.assert_called_once_with("/")
+    mock_cached_ref.return_value.update.assert_called_once_with({
+        "zones/Zone1/voltage": 12.3,
+        "zones/Zone2/voltage": 11.9
+    })
+    assert buffer.pending == {}
+
+@patch('services.firebase_service.cached_ref')
+def test_write_buffer_drops_rejected_path(mock_cached_ref):
+    """Test a write Firebase rejects is dropped instead of re-queued forever"""
+    from services.firebase_service import WriteBuffer
+
+    def update(updates):
+        if "zones/bad.zone/voltage" in updates:
+            raise ValueError("Invalid path")
+    mock_cached_ref.return_value.update.side_effect = update
+
+    buffer = WriteBuffer()
+    buffer.pending = {"zones/Zone1/voltage": 12.3, "zones/bad.zone/voltage": 11.9}
+
+    assert buffer.flush()
+    mock_cached_ref.return_value.update.assert_any_call({"zones/Zone1/voltage": 12.3})
+    assert buffer.pending == {}
+    assert buffer.rejected == 1
+
+@patch('services.database_service.release_db_connection')
+@patch('services.database_service.execute_values')
+@patch('services.database_service.get_db_connection')
+def test_energy_write_buffer_batches_rows(mock_get_conn, mock_execute_values, mock_release):
+    """Test buffered energy rows are inserted with one statement"""
+    from services.database_service import EnergyWriteBuffer
+    
+    buffer = EnergyWriteBuffer()
+    buffer.thread = MagicMock()  # don't start the background flusher
+    buffer.add("Zone1", {"batteryVoltage": 12.4})
+    buffer.add("Zone2", {"batteryVoltage": 11.8})
+    
+    assert buffer.flush()
+    mock_execute_values.assert_called_once()
+    rows = mock_execute_values.call_args[0][2]
+    assert [(row[0], row[2]) for row in rows] == [("Zone1", 12.4), ("Zone2", 11.8)]
+    assert len(buffer.pending) == 0
+
+def test_system_log_entries_map_to_audit_action():
+    """Test optimizer and emergency log entries fill the NOT NULL action column"""
+    from services.database_service import _audit_log_row
+    
+    emergency_row = _audit_log_row({
+        "timestamp": "2024-01-01T00:00:00", "type": "emergency",
+        "emergency_type": "EMERGENCY_SHUTDOWN", "details": {"reason": "test"}, "severity": "HIGH"
+    })
+    decision_row = _audit_log_row({"timestamp": "2024-01-01T00:00:00", "type": "energy_decision", "decision": {}})
+    
+    assert emergency_row[1] == "EMERGENCY_SHUTDOWN"
+    assert emergency_row[3].adapted["details"] == {"reason": "test"}
+    assert decision_row[1] == "energy_decision"
+    assert decision_row[-1] == "2024-01-01T00:00:00"
+
+def test_update_voltage_rejects_non_numeric(client):
+    """Test a non-numeric voltage is refused before it is queued"""
+    response = client.post('/api/energy/updateVoltage', json={'zone': 'Zone1', 'voltage': 'high'})
+    
+    assert response.status_code == 400
+    assert 'Voltage must be a number' in json.loads(response.data)['message']
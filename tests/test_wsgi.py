@@ -0,0 +1,38 @@
+"""
+Test cases for the WSGI entry point
+"""
+
+import importlib
+import sys
+from unittest.mock import patch
+from config import Config
+
+@patch('services.watchdog_service.start_watchdog')
+@patch('services.background_service.start_background_tasks')
+def test_wsgi_boots_background_services(mock_start_background, mock_start_watchdog, monkeypatch):
+    """Test importing wsgi with RUN_BG_SERVICES=1 starts the background services"""
+    monkeypatch.setattr(Config, 'RUN_BG_SERVICES', True)
+    sys.modules.pop('wsgi', None)
+    
+    try:
+        importlib.import_module('wsgi')
+    finally:
+        sys.modules.pop('wsgi', None)
+    
+    mock_start_background.assert_called_once()
+    mock_start_watchdog.assert_called_once()
+
+@patch('services.watchdog_service.start_watchdog')
+@patch('services.background_service.start_background_tasks')
+def test_wsgi_skips_background_services_by_default(mock_start_background, mock_start_watchdog, monkeypatch):
+    """Test web workers don't start the background services"""
+    monkeypatch.setattr(Config, 'RUN_BG_SERVICES', False)
+    sys.modules.pop('wsgi', None)
+    
+    try:
+        importlib.import_module('wsgi')
+    finally:
+        sys.modules.pop('wsgi', None)
+    
+    mock_start_background.assert_not_called()
+    mock_start_watchdog.assert_not_called()
@@ -3,14 +3,24 @@ WSGI entry point for production deployment
 """
 
 from app import app
+from config import Config
 from services.background_service import start_background_tasks
 from services.watchdog_service import start_watchdog
-from services.emergency_service import start_emergency_service
 
-if __name__ == "__main__":
-    # Initialize all services
+def _boot_services():
+    """
+    Start the background services, but only in the one process that owns them.
+    Every gunicorn worker imports this module, so running them everywhere would
+    poll Firebase and send alerts once per worker
+    """
+    if not Config.RUN_BG_SERVICES:
+        return
+    
+    # The emergency service has no loop of its own; the monitors call into it
     start_background_tasks()
     start_watchdog()
-    start_emergency_service()
-    
-    app.run()
\ No newline at end of file
+
+_boot_services()
+
+if __name__ == "__main__":
+    app.run()